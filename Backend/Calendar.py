@@ -1,5 +1,10 @@
+import bisect
 import datetime
+import itertools
 import os.path
+import queue
+import threading
+import traceback
 import tkinter as tk
 from tkinter import ttk, messagebox
 
@@ -13,6 +18,13 @@ from googleapiclient.errors import HttpError
 # Full calendar access
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
+# Events per events().list call; more pages load as the list is scrolled
+PAGE_SIZE = 250
+# Load the next page once the bottom of the list is this close to being visible
+SCROLL_PREFETCH_FRACTION = 0.9
+# How often the Tk loop picks up results from the background worker (ms)
+POLL_INTERVAL_MS = 50
+
 def get_calendar_service():
     creds = None
     if os.path.exists("token.json"):
@@ -27,18 +39,81 @@ def get_calendar_service():
             token.write(creds.to_json())
     return build("calendar", "v3", credentials=creds)
 
+def event_start(event):
+    return event["start"].get("dateTime", event["start"].get("date"))
+
+def sort_key(event):
+    # Mixed offsets and all-day dates don't sort as strings, so compare in UTC
+    start = datetime.datetime.fromisoformat(event_start(event))
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=datetime.timezone.utc)
+    return (start.astimezone(datetime.timezone.utc), event["id"])
+
+class CalendarWorker:
+    """Runs Calendar API calls off the Tk thread.
+
+    One thread owns the service object (httplib2 connections aren't thread-safe).
+    Callbacks are queued back and run on the Tk thread by ``drain``.
+    """
+
+    def __init__(self, service_factory):
+        self._service_factory = service_factory
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="calendar-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, call, on_success, on_error):
+        """Run ``call(service)`` in the background, then one of the callbacks on the Tk thread."""
+        self._jobs.put((call, on_success, on_error))
+
+    def stop(self):
+        self._jobs.put(None)
+
+    def _run(self):
+        service = None
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            call, on_success, on_error = job
+            try:
+                if service is None:
+                    service = self._service_factory()
+                self._results.put((on_success, call(service)))
+            except Exception as error:
+                self._results.put((on_error, error))
+
+    def drain(self):
+        """Run queued callbacks on the Tk thread; one failing callback must not strand the others."""
+        while True:
+            try:
+                callback, value = self._results.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                callback(value)
+            except Exception:
+                traceback.print_exc()
+
 class CalendarGUI(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Google Calendar GUI")
         self.geometry("750x500")
-        self.service = get_calendar_service()
+        self.worker = CalendarWorker(get_calendar_service)
 
-        # Treeview for events
-        self.tree = ttk.Treeview(self, columns=("start", "summary"), show="headings")
+        # Treeview for events; row iids are Google event ids so refreshes can diff in place
+        list_frame = tk.Frame(self)
+        list_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        self.tree = ttk.Treeview(list_frame, columns=("start", "summary"), show="headings")
         self.tree.heading("start", text="Start")
         self.tree.heading("summary", text="Event")
-        self.tree.pack(fill=tk.BOTH, expand=True, pady=10)
+        self.tree.tag_configure("pending", foreground="gray")
+        self.scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_scroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
         # Buttons
         btn_frame = tk.Frame(self)
@@ -47,34 +122,194 @@ class CalendarGUI(tk.Tk):
         tk.Button(btn_frame, text="Add Event", command=self.add_event_dialog).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Delete Selected", command=self.delete_selected).pack(side=tk.LEFT, padx=5)
 
-        self.events = []
+        self.status = tk.StringVar(value="")
+        tk.Label(self, textvariable=self.status, anchor="w").pack(fill=tk.X, padx=10, pady=(0, 5))
 
-    def fetch_events(self):
+        # Loaded events by id, plus their sort keys in display order
+        self.events = {}
+        self.order = []
+        self.next_page_token = None
+        # Sort key of the last row the current listing has reached
+        self.window_end = None
+        self.loading = False
+        # Bumped on every refresh so pages from an older listing are dropped
+        self.generation = 0
+        self.time_min = None
+        self.pending_deletes = set()
+        self.temp_ids = itertools.count(1)
+
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(POLL_INTERVAL_MS, self.poll_worker)
+        self.fetch_events()
+
+    def poll_worker(self):
         try:
-            now = datetime.datetime.utcnow().isoformat() + "Z"
-            events_result = (
-                self.service.events()
+            self.worker.drain()
+        finally:
+            # Always re-arm, or no later fetch, create or delete result would reach the UI
+            self.after(POLL_INTERVAL_MS, self.poll_worker)
+
+    def on_close(self):
+        self.worker.stop()
+        self.destroy()
+
+    # ---- Loading -------------------------------------------------------
+
+    def fetch_events(self):
+        """Reload from the first page; rows are diffed rather than rebuilt."""
+        self.generation += 1
+        self.next_page_token = None
+        # Page tokens are only valid for the query that produced them, so pin timeMin per listing
+        self.time_min = datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+        self.load_page(None)
+
+    def load_more(self):
+        if self.next_page_token and not self.loading:
+            self.load_page(self.next_page_token)
+
+    def load_page(self, page_token):
+        generation = self.generation
+        self.loading = True
+        self.status.set("Loading events...")
+        time_min = self.time_min
+
+        def call(service):
+            return (
+                service.events()
                 .list(
                     calendarId="primary",
-                    timeMin=now,
-                    maxResults=20,
+                    timeMin=time_min,
+                    maxResults=PAGE_SIZE,
                     singleEvents=True,
                     orderBy="startTime",
+                    pageToken=page_token,
                 )
                 .execute()
             )
-            self.events = events_result.get("items", [])
 
-            for i in self.tree.get_children():
-                self.tree.delete(i)
+        def on_success(events_result):
+            if generation != self.generation:
+                return
+            self.loading = False
+            self.next_page_token = events_result.get("nextPageToken")
+            items = events_result.get("items", [])
+            self.apply_page(items, first_page=page_token is None)
+            more = " (scroll for more)" if self.next_page_token else ""
+            self.status.set(f"{len(self.events)} events loaded{more}")
+            # A short first page may not fill the view, so no scroll event would ask for more
+            self.on_scroll(*self.tree.yview())
+
+        def on_error(error):
+            if generation != self.generation:
+                return
+            self.loading = False
+            self.status.set("")
+            messagebox.showerror("Error", f"An error occurred: {error}")
+
+        self.worker.submit(call, on_success, on_error)
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= SCROLL_PREFETCH_FRACTION:
+            self.load_more()
+
+    def apply_page(self, items, first_page):
+        fetched = {ev["id"]: ev for ev in items if ev["id"] not in self.pending_deletes}
+        # Rows this page covers that the server no longer returns were deleted elsewhere
+        window_start = None if first_page else self.window_end
+        window_end = sort_key(items[-1]) if items and self.next_page_token else None
+        for key in list(self.order):
+            if window_start is not None and key <= window_start:
+                continue
+            if window_end is not None and key > window_end:
+                break
+            if key[1] not in fetched and not key[1].startswith("pending-"):
+                self.remove_row(key[1])
+        self.window_end = window_end
+        for ev in fetched.values():
+            self.upsert_row(ev)
+
+    # ---- Row bookkeeping -------------------------------------------------
+
+    def row_values(self, event):
+        return (event_start(event), event.get("summary", "(no title)"))
+
+    def upsert_row(self, event, tags=()):
+        event_id = event["id"]
+        key = sort_key(event)
+        current = self.events.get(event_id)
+        if current is not None:
+            old_key = sort_key(current)
+            if old_key == key:
+                self.events[event_id] = event
+                self.tree.item(event_id, values=self.row_values(event), tags=tags)
+                return
+            self.remove_row(event_id)
+        index = bisect.bisect_left(self.order, key)
+        self.order.insert(index, key)
+        self.events[event_id] = event
+        self.tree.insert("", index, iid=event_id, values=self.row_values(event), tags=tags)
+
+    def remove_row(self, event_id):
+        event = self.events.pop(event_id, None)
+        if event is None:
+            return None
+        key = sort_key(event)
+        index = bisect.bisect_left(self.order, key)
+        del self.order[index]
+        self.tree.delete(event_id)
+        return event
+
+    # ---- Create / delete -------------------------------------------------
 
-            for ev in self.events:
-                start = ev["start"].get("dateTime", ev["start"].get("date"))
-                summary = ev.get("summary", "(no title)")
-                self.tree.insert("", tk.END, values=(start, summary))
-        except HttpError as error:
+    def create_event(self, event):
+        """Show the event immediately, then swap in the server's copy (or roll back)."""
+        temp_id = f"pending-{next(self.temp_ids)}"
+        self.upsert_row(dict(event, id=temp_id), tags=("pending",))
+        self.status.set("Saving event...")
+
+        def on_success(created):
+            self.remove_row(temp_id)
+            self.upsert_row(created)
+            self.status.set(f"Event created: {created.get('htmlLink')}")
+
+        def on_error(error):
+            self.remove_row(temp_id)
+            self.status.set("")
             messagebox.showerror("Error", f"An error occurred: {error}")
 
+        self.worker.submit(
+            lambda service: service.events().insert(calendarId="primary", body=event).execute(),
+            on_success,
+            on_error,
+        )
+
+    def delete_event(self, event_id):
+        """Hide the row immediately and restore it if the API call fails."""
+        event = self.remove_row(event_id)
+        if event is None:
+            return
+        self.pending_deletes.add(event_id)
+
+        def on_success(_):
+            self.pending_deletes.discard(event_id)
+            self.status.set("Event deleted")
+
+        def on_error(error):
+            self.pending_deletes.discard(event_id)
+            # 410 means someone else already deleted it
+            if isinstance(error, HttpError) and error.resp.status == 410:
+                self.status.set("Event deleted")
+                return
+            self.upsert_row(event)
+            messagebox.showerror("Error", f"An error occurred: {error}")
+
+        self.worker.submit(
+            lambda service: service.events().delete(calendarId="primary", eventId=event_id).execute(),
+            on_success,
+            on_error,
+        )
+
     def add_event_dialog(self):
         dialog = tk.Toplevel(self)
         dialog.title("Add Event")
@@ -127,32 +362,21 @@ class CalendarGUI(tk.Tk):
 
             }
 
-            try:
-                # Add event
-                created = self.service.events().insert(calendarId="primary", body=event).execute()
-                messagebox.showinfo("Success", f"Event created: {created.get('htmlLink')}")
-                dialog.destroy()
-                self.fetch_events()
-            except HttpError as error:
-                messagebox.showerror("Error", f"An error occurred: {error}")
+            dialog.destroy()
+            self.create_event(event)
 
         tk.Button(dialog, text="Save Event", command=save_event).pack(pady=10)
 
     def delete_selected(self):
-        selected = self.tree.selection()
+        selected = [iid for iid in self.tree.selection() if iid in self.events]
         if not selected:
             messagebox.showwarning("Delete", "No event selected")
             return
-        idx = self.tree.index(selected[0])
-        event_id = self.events[idx]["id"]
-        try:
-            # Delete event
-            self.service.events().delete(calendarId="primary", eventId=event_id).execute()
-            messagebox.showinfo("Deleted", "Event deleted successfully")
-            self.fetch_events()
-        except HttpError as error:
-            messagebox.showerror("Error", f"An error occurred: {error}")
+        for event_id in selected:
+            if event_id.startswith("pending-"):
+                continue
+            self.delete_event(event_id)
 
 if __name__ == "__main__":
     app = CalendarGUI()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
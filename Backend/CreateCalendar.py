@@ -1,4 +1,5 @@
 import datetime
+import logging
 import os.path
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -6,6 +7,10 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from StructuredLogging import get_logger, log_event
+
+log = get_logger("calendar")
+
 # Full calendar access
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
@@ -38,20 +43,20 @@ class CalendarAPI:
         }
         try:
             created = self.service.events().insert(calendarId="primary", body=event).execute()
-            print(f"✅ Event created: {created.get('htmlLink')}")
+            log_event(log, logging.INFO, "event_created", event_id=created.get("id"))
             return created["id"]
         except HttpError as error:
-            print(f"❌ Error creating event: {error}")
+            log_event(log, logging.ERROR, "event_create_failed", error=str(error))
             return None
 
     def delete_event(self, event_id: str):
         """Delete an event by its ID"""
         try:
             self.service.events().delete(calendarId="primary", eventId=event_id).execute()
-            print("❌ Event deleted successfully")
+            log_event(log, logging.INFO, "event_deleted", event_id=event_id)
             return True
         except HttpError as error:
-            print(f"❌ Error deleting event: {error}")
+            log_event(log, logging.ERROR, "event_delete_failed", event_id=event_id, error=str(error))
             return False
 
     def list_events(self, n=10):
@@ -70,17 +75,10 @@ class CalendarAPI:
                 .execute()
             )
             events = events_result.get("items", [])
-            if not events:
-                print("No upcoming events found.")
-                return []
-            for ev in events:
-                start = ev["start"].get("dateTime", ev["start"].get("date"))
-                summary = ev.get("summary", "(no title)")
-                desc = ev.get("description", "")
-                print(f"- {start}: {summary} — {desc}")
+            log_event(log, logging.DEBUG, "events_listed", count=len(events))
             return events
         except HttpError as error:
-            print(f"❌ Error fetching events: {error}")
+            log_event(log, logging.ERROR, "event_list_failed", error=str(error))
             return []
 
 # Example usage
@@ -98,7 +96,8 @@ if __name__ == "__main__":
     event_id = api.add_event("Team Meeting 2", "Discuss project milestones", start, end)
 
     # READ EVENTS
-    api.list_events(5)
+    for ev in api.list_events(5):
+        print(f"- {ev['start'].get('dateTime', ev['start'].get('date'))}: {ev.get('summary', '(no title)')}")
 
     # DELETE EVENT
     # if event_id:
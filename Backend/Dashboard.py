@@ -0,0 +1,144 @@
+import json
+import uuid
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from StateStore import StateStore
+
+# Comment: reply latency buckets (seconds), from instant replies up to a slow day; the sub-second
+# ones keep percentiles meaningful when fast-path and fake replies land well under a second
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800, 3600,
+    4 * 3600, 12 * 3600, 24 * 3600,
+)
+PERCENTILES: Tuple[int, ...] = (50, 90, 99)
+
+
+class DashboardAggregates:
+    """Counters behind ``/dashboard``, updated as events happen rather than scanned per request.
+
+    Everything lives in the shared StateStore so every worker sees the same numbers. Each
+    update bumps a version; the rendered snapshot (and its ETag) is rebuilt only when the
+    version moves, so polling screens cost one key read.
+    """
+
+    def __init__(self, store: StateStore, namespace: str = "dashboard", buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.store = store
+        self.namespace = namespace
+        # Comment: membership sets, so counts stay exact when the same thread is reported twice
+        self.open_emergencies_ns = f"{namespace}_open_emergencies"
+        self.awaiting_patient_ns = f"{namespace}_awaiting_patient"
+        self.buckets = tuple(sorted(buckets))
+        self._lock = Lock()
+        self._cached: Optional[Tuple[int, str, bytes]] = None
+        self._epoch: Optional[str] = None
+
+    # ---- updates ----------------------------------------------------------
+
+    def _changed(self) -> None:
+        self.store.incr(self.namespace, "version")
+
+    def record_booking(self, day: str) -> None:
+        """Count a booking on ``day`` (clinic-local YYYY-MM-DD)."""
+        self.store.incr(self.namespace, f"bookings:{day}")
+        self._changed()
+
+    def record_emergency(self, thread_id: str) -> None:
+        if self.store.claim(self.open_emergencies_ns, thread_id, True):
+            self._changed()
+
+    def clear_emergencies(self) -> None:
+        self.store.replace(self.open_emergencies_ns, {})
+        self._changed()
+
+    def record_awaiting_patient(self, thread_id: str) -> None:
+        """Times were offered and the thread now waits for the patient to pick one."""
+        if self.store.claim(self.awaiting_patient_ns, thread_id, True):
+            self.store.incr(self.namespace, "awaiting_patient")
+            self._changed()
+
+    def clear_awaiting_patient(self, thread_id: str) -> None:
+        """The patient wrote back or the appointment was booked."""
+        if self.store.pop(self.awaiting_patient_ns, thread_id, False):
+            self.store.incr(self.namespace, "awaiting_patient", -1)
+            self._changed()
+
+    def record_inbound(self, thread_id: str) -> None:
+        """The patient wrote back, so the thread is no longer waiting on them."""
+        self.clear_awaiting_patient(thread_id)
+
+    def record_reply(self, thread_id: str, latency_seconds: Optional[float]) -> None:
+        if latency_seconds is not None:
+            index = bisect_left(self.buckets, max(latency_seconds, 0.0))
+            self.store.incr(self.namespace, self._bucket_key(index))
+            self.store.incr(self.namespace, "latency_sum_ms", int(latency_seconds * 1000))
+        self._changed()
+
+    def _bucket_key(self, index: int) -> str:
+        # Comment: keyed by upper bound, so counts stored under another bucket layout are never misread
+        bound = f"{self.buckets[index]:g}" if index < len(self.buckets) else "+Inf"
+        return f"latency_le:{bound}"
+
+    # ---- snapshot ---------------------------------------------------------
+
+    def _percentile(self, counts: List[int], total: int, percentile: int) -> Optional[float]:
+        """Interpolate within the bucket holding the percentile, like Prometheus' histogram_quantile.
+
+        None when it falls past the last bucket.
+        """
+        rank = total * percentile / 100
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                return round(lower + (bound - lower) * (rank - cumulative) / count, 3)
+            cumulative += count
+            lower = float(bound)
+        return None
+
+    def build(self, generated_at: str) -> Dict[str, Any]:
+        values = self.store.items(self.namespace)
+        bookings = {
+            key.split(":", 1)[1]: int(count)
+            for key, count in values.items()
+            if key.startswith("bookings:")
+        }
+        counts = [int(values.get(self._bucket_key(index), 0)) for index in range(len(self.buckets) + 1)]
+        total = sum(counts)
+        latency: Dict[str, Any] = {"count": total}
+        if total:
+            latency["mean_seconds"] = round(int(values.get("latency_sum_ms", 0)) / total / 1000, 3)
+            for percentile in PERCENTILES:
+                latency[f"p{percentile}_seconds"] = self._percentile(counts, total, percentile)
+        return {
+            "generated_at": generated_at,
+            "version": int(values.get("version", 0)),
+            "bookings_per_day": dict(sorted(bookings.items())),
+            # Comment: open emergencies are few and cleared on reset, so counting the set is cheap
+            "open_emergencies": len(self.store.keys(self.open_emergencies_ns)),
+            "threads_awaiting_patient": int(values.get("awaiting_patient", 0)),
+            "reply_latency": latency,
+        }
+
+    def epoch(self) -> str:
+        """An id for this store's lifetime; the version restarts at 0 when a memory store is rebuilt."""
+        if self._epoch is None:
+            # Comment: claim is first-writer-wins, so every worker sharing the store agrees on one id
+            self.store.claim(self.namespace, "epoch", uuid.uuid4().hex[:12])
+            self._epoch = self.store.get(self.namespace, "epoch")
+        return self._epoch
+
+    def snapshot(self, generated_at: str) -> Tuple[str, bytes]:
+        """Return ``(etag, json body)``, rebuilding only if something changed since the last call."""
+        version = int(self.store.get(self.namespace, "version", 0))
+        with self._lock:
+            cached = self._cached
+            if cached is not None and cached[0] == version:
+                return cached[1], cached[2]
+            body = json.dumps(self.build(generated_at), separators=(",", ":")).encode()
+            # Comment: epoch and version are shared, so every worker hands out the same ETag for the same data,
+            # and a restarted process never reuses an ETag a client holds from before
+            etag = f"dashboard-{self.epoch()}-{version}"
+            self._cached = (version, etag, body)
+            return etag, body
@@ -0,0 +1,308 @@
+"""In-process stand-ins for AgentMail, ngrok, the OpenAI agent runner and Google Calendar.
+
+``install_fakes()`` registers fake modules in ``sys.modules`` so ``main`` can be
+imported and exercised with no network access. Call it before importing ``main``.
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from threading import Lock
+from types import ModuleType, SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+ToolCaller = Callable[..., Awaitable[Any]]
+AgentScript = Callable[[List[Dict[str, Any]], ToolCaller], Awaitable[str]]
+
+
+class FakeConfig:
+    """Latency knobs shared by every fake, in seconds."""
+
+    def __init__(
+        self,
+        llm_latency: float = 0.5,
+        llm_jitter: float = 0.2,
+        calendar_latency: float = 0.05,
+        mail_latency: float = 0.02,
+        script: Optional["AgentScript"] = None,
+    ):
+        self.llm_latency = llm_latency
+        self.llm_jitter = llm_jitter
+        self.calendar_latency = calendar_latency
+        self.mail_latency = mail_latency
+        # Comment: None means default_script, resolved at call time
+        self.script = script
+
+    def llm_delay(self) -> float:
+        return max(0.0, self.llm_latency + random.uniform(-self.llm_jitter, self.llm_jitter))
+
+
+CONFIG = FakeConfig()
+
+
+# --------------------------
+# AgentMail
+# --------------------------
+class _FakeMessages:
+    def __init__(self):
+        self.replies: List[Dict[str, Any]] = []
+        self.updates: List[Dict[str, Any]] = []
+        # Comment: wall-clock time each message_id was answered, for end-to-end latency
+        self.replied_at: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def reply(self, inbox_id: str, message_id: str, text: str, **kwargs: Any) -> SimpleNamespace:
+        time.sleep(CONFIG.mail_latency)
+        with self._lock:
+            self.replies.append({"inbox_id": inbox_id, "message_id": message_id, "text": text})
+            self.replied_at[message_id] = time.perf_counter()
+        return SimpleNamespace(message_id=f"reply-{message_id}", thread_id=None)
+
+    def update(self, inbox_id: str, message_id: str, **kwargs: Any) -> SimpleNamespace:
+        time.sleep(CONFIG.mail_latency)
+        with self._lock:
+            self.updates.append({"inbox_id": inbox_id, "message_id": message_id, **kwargs})
+        return SimpleNamespace(message_id=message_id)
+
+    def list(self, inbox_id: str, **kwargs: Any) -> SimpleNamespace:
+        return SimpleNamespace(count=0, limit=kwargs.get("limit"), next_page_token=None, messages=[])
+
+
+class FakeAgentMail:
+    def __init__(self, *args: Any, **kwargs: Any):
+        self.inboxes = SimpleNamespace(messages=_FakeMessages())
+
+
+class FakeAgentMailToolkit:
+    def __init__(self, client: Any = None):
+        self.client = client
+
+    def get_tools(self, names: Optional[List[str]] = None) -> List[Any]:
+        # Comment: the fake runner never calls AgentMail tools; replies go through the client
+        return []
+
+
+# --------------------------
+# ngrok
+# --------------------------
+class FakeListener:
+    def __init__(self, port: int):
+        self.port = port
+
+    def url(self) -> str:
+        return f"http://localhost:{self.port}"
+
+
+def fake_forward(port: int, **kwargs: Any) -> FakeListener:
+    return FakeListener(port)
+
+
+# --------------------------
+# Google Calendar
+# --------------------------
+class FakeCalendarAPI:
+    """Dict-backed calendar with the same surface as CreateCalendar.CalendarAPI."""
+
+    events: Dict[str, Dict[str, Any]] = {}
+    _ids = count(1)
+    _lock = Lock()
+
+    def __init__(self):
+        pass
+
+    def add_event(self, title: str, description: str, start_dt: datetime, end_dt: datetime, tz="America/New_York"):
+        time.sleep(CONFIG.calendar_latency)
+        with self._lock:
+            event_id = f"evt{next(self._ids)}"
+            self.events[event_id] = {
+                "id": event_id,
+                "summary": title,
+                "description": description,
+                "start": {"dateTime": _as_utc_iso(start_dt, tz), "timeZone": tz},
+                "end": {"dateTime": _as_utc_iso(end_dt, tz), "timeZone": tz},
+            }
+        return event_id
+
+    def delete_event(self, event_id: str):
+        time.sleep(CONFIG.calendar_latency)
+        with self._lock:
+            return self.events.pop(event_id, None) is not None
+
+    def list_events(self, n=10):
+        time.sleep(CONFIG.calendar_latency)
+        with self._lock:
+            ordered = sorted(self.events.values(), key=lambda ev: ev["start"]["dateTime"])
+        return ordered[:n]
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls.events = {}
+
+
+def _as_utc_iso(value: datetime, tz: str) -> str:
+    if value.tzinfo is None and tz == "UTC":
+        value = value.replace(tzinfo=timezone.utc)
+    return value.isoformat()
+
+
+# --------------------------
+# openai-agents
+# --------------------------
+class FakeAgent:
+    def __init__(self, name: str, instructions: str = "", tools: Optional[List[Any]] = None, **kwargs: Any):
+        self.name = name
+        self.instructions = instructions
+        self.tools = list(tools or [])
+
+
+class FakeRunHooks:
+    async def on_tool_start(self, context, agent, tool) -> None:
+        pass
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        pass
+
+
+class FakeRunResult:
+    def __init__(self, input_items: List[Dict[str, Any]], final_output: str, input_tokens: int, output_tokens: int):
+        self.final_output = final_output
+        self._items = input_items + [{"role": "assistant", "content": final_output}]
+        usage = SimpleNamespace(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            total_tokens=input_tokens + output_tokens,
+        )
+        self.context_wrapper = SimpleNamespace(usage=usage)
+
+    def to_input_list(self) -> List[Dict[str, Any]]:
+        return list(self._items)
+
+
+_TOOL_CALL_IDS = count(1)
+
+
+class FakeRunner:
+    """Replays ``CONFIG.script`` with simulated model latency before every turn."""
+
+    @classmethod
+    async def run(cls, starting_agent: FakeAgent, input: List[Dict[str, Any]], *, hooks=None, **kwargs: Any):
+        tools = {tool.name: tool for tool in starting_agent.tools}
+        hooks = hooks or FakeRunHooks()
+
+        async def call_tool(name: str, **arguments: Any) -> Any:
+            # Comment: each tool call costs one model turn to decide on it
+            await asyncio.sleep(CONFIG.llm_delay())
+            tool = tools[name]
+            # Comment: shaped like openai-agents' ToolContext
+            context = SimpleNamespace(
+                tool_name=name,
+                tool_call_id=f"call_{next(_TOOL_CALL_IDS)}",
+                tool_arguments=json.dumps(arguments),
+            )
+            await hooks.on_tool_start(context, starting_agent, tool)
+            result = await tool(**arguments)
+            await hooks.on_tool_end(context, starting_agent, tool, result)
+            return result
+
+        script = CONFIG.script or default_script
+        final_output = await script(input, call_tool)
+        await asyncio.sleep(CONFIG.llm_delay())
+        input_tokens = sum(len(str(item.get("content", ""))) for item in input) // 4
+        return FakeRunResult(input, final_output, input_tokens, len(final_output) // 4)
+
+
+def fake_function_tool(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Keep the coroutine callable so the fake runner can invoke it directly."""
+    func.name = func.__name__
+    return func
+
+
+def _last_user_text(input_items: List[Dict[str, Any]]) -> str:
+    for item in reversed(input_items):
+        if item.get("role") == "user":
+            return str(item.get("content", ""))
+    return ""
+
+
+async def default_script(input_items: List[Dict[str, Any]], call_tool: ToolCaller) -> str:
+    """Emergency -> flag JSON; scheduling -> offer then book the first slot; else a short answer."""
+    text = _last_user_text(input_items).lower()
+    if "chest pain" in text:
+        return '{"emergency": true, "message": "Patient reports chest pain."}'
+    if "appointment" in text:
+        offer = await call_tool(
+            "schedule_appointment",
+            patient_name="Load Test",
+            reason="checkup",
+            preferred_slots=[],
+            date_of_birth="1990-01-01",
+        )
+        alternatives = offer.get("alternatives") or []
+        if not alternatives:
+            return "Sorry, we have no openings this week. Staff will follow up."
+        booked = await call_tool(
+            "schedule_appointment",
+            patient_name="Load Test",
+            reason="checkup",
+            preferred_slots=[alternatives[0]],
+            confirmed=True,
+            date_of_birth="1990-01-01",
+        )
+        if booked.get("status") == "booked":
+            return f"You're booked for {alternatives[0]}. Confirmation {booked['appointment']['confirmation_id']}."
+        return "That time was just taken; here are other options."
+    return "Thanks for your message. Our hours are 9:00 AM to 5:00 PM every day."
+
+
+# --------------------------
+# Installation
+# --------------------------
+def _module(name: str, **attributes: Any) -> ModuleType:
+    module = ModuleType(name)
+    for key, value in attributes.items():
+        setattr(module, key, value)
+    return module
+
+
+def install_fakes(config: Optional[FakeConfig] = None) -> FakeConfig:
+    """Register fake upstream modules. Must run before ``import main``."""
+    global CONFIG
+    if config is not None:
+        CONFIG = config
+    FakeCalendarAPI.reset()
+
+    agents_tool = _module("agents.tool", function_tool=fake_function_tool)
+    sys.modules.update({
+        "ngrok": _module("ngrok", forward=fake_forward),
+        "agentmail": _module("agentmail", AgentMail=FakeAgentMail),
+        "agentmail_toolkit": _module("agentmail_toolkit"),
+        "agentmail_toolkit.openai": _module("agentmail_toolkit.openai", AgentMailToolkit=FakeAgentMailToolkit),
+        "agents": _module(
+            "agents", Agent=FakeAgent, RunHooks=FakeRunHooks, Runner=FakeRunner, function_tool=fake_function_tool,
+            tool=agents_tool,
+        ),
+        "agents.tool": agents_tool,
+        "CreateCalendar": _module("CreateCalendar", CalendarAPI=FakeCalendarAPI),
+    })
+    return CONFIG
+
+
+def seed_busy_calendar(start: datetime, days: int = 7, every: int = 3) -> None:
+    """Pre-book every ``every``-th half hour so availability has realistic gaps."""
+    calendar = FakeCalendarAPI()
+    for day in range(days):
+        day_start = (start + timedelta(days=day)).replace(hour=9, minute=0, second=0, microsecond=0)
+        for index in range(0, 16, every):
+            slot = day_start + timedelta(minutes=30 * index)
+            with FakeCalendarAPI._lock:
+                event_id = f"busy{next(FakeCalendarAPI._ids)}"
+                FakeCalendarAPI.events[event_id] = {
+                    "id": event_id,
+                    "summary": "Busy",
+                    "start": {"dateTime": slot.isoformat()},
+                    "end": {"dateTime": (slot + timedelta(minutes=30)).isoformat()},
+                }
@@ -0,0 +1,155 @@
+import json
+import os
+import re
+from itertools import count
+from threading import Lock
+from typing import Any, Dict, IO, List, Optional
+
+from StructuredLogging import REDACT, REDACTED_FIELDS, redact
+
+# Comment: besides the logging fields, drop addresses and every rendering of the email body
+RECORDER_REDACTED_FIELDS = REDACTED_FIELDS | frozenset({
+    "arguments",
+    "bcc",
+    "cc",
+    "extracted_html",
+    "extracted_text",
+    "final_output",
+    "from",
+    "from_",
+    "html",
+    "output",
+    "patient",
+    "preview",
+    "reply_to",
+    "result",
+    "to",
+})
+
+_SEGMENT_NAME = re.compile(r"^flight-(\d+)-\d+\.jsonl$")
+_REDACTED_MARKER = re.compile(r"^\[redacted len=(\d+)\]$")
+
+
+def redact_tree(value: Any, key: Optional[str] = None) -> Any:
+    """Redact string leaves under patient-content keys; structure, ids and labels are kept."""
+    if isinstance(value, dict):
+        return {k: redact_tree(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact_tree(item, key) for item in value]
+    if REDACT and key in RECORDER_REDACTED_FIELDS and isinstance(value, str) and value:
+        return redact(value)
+    return value
+
+
+def placeholder(value: Any) -> Any:
+    """Turn ``[redacted len=N]`` markers back into N characters so replayed sizes stay realistic."""
+    if isinstance(value, dict):
+        return {k: placeholder(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [placeholder(item) for item in value]
+    if isinstance(value, str):
+        match = _REDACTED_MARKER.match(value)
+        if match:
+            return "x" * int(match.group(1))
+    return value
+
+
+class FlightRecorder:
+    """Append one JSON line per processed message to size-capped segment files.
+
+    Segments are named ``flight-<pid>-<n>.jsonl`` so several workers can share a directory.
+    Each process keeps at most ``max_segments`` of its own and never touches a live
+    worker's files (it may still be writing to them). Segments left by exited processes
+    share one more budget of ``max_segments``.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 8 * 1024 * 1024, max_segments: int = 20):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self._lock = Lock()
+        self._file: Optional[IO[str]] = None
+        self._numbers = count(1)
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, flight: Dict[str, Any]) -> None:
+        line = json.dumps(redact_tree(flight), separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            if self._file is None or self._file.tell() >= self.segment_bytes:
+                self._rotate()
+            self._file.write(line)
+            # Comment: flush per record so a crash loses at most the message in flight
+            self._file.flush()
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.directory, f"flight-{os.getpid()}-{next(self._numbers):06d}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+        own: List[str] = []
+        orphaned: List[str] = []
+        for segment in segment_paths(self.directory):
+            pid = segment_pid(segment)
+            if pid == os.getpid():
+                own.append(segment)
+            elif not _is_running(pid):
+                orphaned.append(segment)
+        for old in own[:-self.max_segments] + orphaned[:-self.max_segments]:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                # Comment: another worker pruned the same orphan first
+                pass
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def segment_pid(path: str) -> int:
+    return int(_SEGMENT_NAME.match(os.path.basename(path)).group(1))
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Comment: the process exists but belongs to another user
+        pass
+    return True
+
+
+def segment_paths(directory: str) -> List[str]:
+    """Segment files, oldest first."""
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if _SEGMENT_NAME.match(name)]
+    return sorted(paths, key=os.path.getmtime)
+
+
+def read_flights(directory: str) -> List[Dict[str, Any]]:
+    """Every recorded flight in the order the messages arrived."""
+    flights: List[Dict[str, Any]] = []
+    for path in segment_paths(directory):
+        with open(path, encoding="utf-8") as segment:
+            for line in segment:
+                line = line.strip()
+                if line:
+                    flights.append(json.loads(line))
+    # Comment: several workers may share a directory, so merge their segments by arrival time
+    flights.sort(key=lambda flight: flight.get("recorded_at", 0))
+    return flights
+
+
+def create_recorder() -> Optional[FlightRecorder]:
+    """The recorder configured by ``FLIGHT_RECORDER_DIR``, or None when recording is off."""
+    directory = os.getenv("FLIGHT_RECORDER_DIR")
+    if not directory:
+        return None
+    return FlightRecorder(
+        directory,
+        segment_bytes=int(os.getenv("FLIGHT_RECORDER_SEGMENT_BYTES", str(8 * 1024 * 1024))),
+        max_segments=int(os.getenv("FLIGHT_RECORDER_MAX_SEGMENTS", "20")),
+    )
@@ -0,0 +1,216 @@
+"""Offline load test: replay synthetic webhooks against /webhooks with every upstream faked.
+
+    python LoadTest.py --messages 500 --rate 50 --llm-latency 0.5
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import Fakes
+
+
+def build_payloads(
+    messages: int,
+    threads: int,
+    schedule_ratio: float,
+    emergency_ratio: float,
+    duplicate_ratio: float,
+    outbound_ratio: float,
+    seed: int,
+) -> List[Dict[str, Any]]:
+    """Synthetic AgentMail webhook payloads, including retries and outbound events."""
+    rng = random.Random(seed)
+    payloads: List[Dict[str, Any]] = []
+    for index in range(messages):
+        roll = rng.random()
+        if roll < emergency_ratio:
+            body = "I have had chest pain since this morning."
+        elif roll < emergency_ratio + schedule_ratio:
+            body = "Hi, I'd like to book an appointment for a checkup this week. Any time works."
+        else:
+            body = "What are your opening hours on weekends?"
+        outbound = rng.random() < outbound_ratio
+        payload = {
+            "event_id": f"evt-{index}",
+            "event_type": "message.sent" if outbound else "message.received",
+            "message": {
+                "message_id": f"<msg-{index}@bench>",
+                "thread_id": f"thread-{index % threads}",
+                "labels": ["sent"] if outbound else ["received", "unreplied"],
+                "from": f"Patient {index % threads} <patient{index % threads}@example.com>",
+                "subject": "Question",
+                "text": body,
+            },
+        }
+        payloads.append(payload)
+        if rng.random() < duplicate_ratio:
+            # Comment: providers retry with the same event and message ids
+            payloads.append(payload)
+    return payloads
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def deep_size(obj: Any, seen: Optional[set] = None) -> int:
+    """Approximate retained bytes of nested containers."""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def state_sizes(main: Any) -> Dict[str, int]:
+    def size(*namespaces: str) -> int:
+        return sum(deep_size(main.STATE.items(namespace)) for namespace in namespaces)
+
+    return {
+        "dedup": size(main.PROCESSED_EVENTS_NS, main.PROCESSED_MESSAGES_NS),
+        "thread_memory": size(main.THREAD_MESSAGES_NS),
+        "scheduling": size(main.AVAILABLE_SLOTS_NS, main.BOOKED_APPOINTMENTS_NS),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    config = Fakes.install_fakes(Fakes.FakeConfig(
+        llm_latency=args.llm_latency,
+        llm_jitter=args.llm_jitter,
+        calendar_latency=args.calendar_latency,
+        mail_latency=args.mail_latency,
+    ))
+    os.environ.setdefault("INBOX_USERNAME", "loadtest")
+    if not args.verbose:
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["PROCESSING_WORKERS"] = str(args.workers)
+    os.environ["PROCESSING_QUEUE_SIZE"] = str(max(args.messages * 2, 1000))
+    Fakes.seed_busy_calendar(datetime(2025, 9, 28, 10, 0, tzinfo=timezone(timedelta(hours=-4))))
+
+    import main
+
+    main.warm_up()
+    app = main.create_app(warm=False)
+
+    payloads = build_payloads(
+        args.messages, args.threads, args.schedule_ratio, args.emergency_ratio,
+        args.duplicate_ratio, args.outbound_ratio, args.seed,
+    )
+    messages_api = main.get_client().inboxes.messages
+    posted_at: Dict[str, float] = {}
+
+    tracemalloc.start()
+    gc.collect()
+    before_sizes = state_sizes(main)
+    before_traced, _ = tracemalloc.get_traced_memory()
+
+    def post(payload: Dict[str, Any]) -> int:
+        message_id = payload["message"]["message_id"]
+        posted_at.setdefault(message_id, time.perf_counter())
+        with app.test_client() as http:
+            return http.post("/webhooks", json=payload).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = []
+        for index, payload in enumerate(payloads):
+            if args.rate > 0:
+                # Comment: open-loop pacing so a slow server shows up as queueing, not fewer requests
+                delay = started + index / args.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            futures.append(pool.submit(post, payload))
+        statuses = [future.result() for future in futures]
+        ingest_done = time.perf_counter()
+        main.PROCESSING_QUEUE.join()
+    finished = time.perf_counter()
+
+    gc.collect()
+    after_traced, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    after_sizes = state_sizes(main)
+
+    latencies = [
+        replied - posted_at[message_id]
+        for message_id, replied in messages_api.replied_at.items()
+        if message_id in posted_at
+    ]
+    elapsed = finished - started
+    return {
+        "payloads": len(payloads),
+        "http_non_200": sum(1 for status in statuses if status != 200),
+        "ingest_seconds": ingest_done - started,
+        "elapsed_seconds": elapsed,
+        "messages_per_second": len(payloads) / elapsed if elapsed else 0.0,
+        "replies": len(latencies),
+        "bookings": len(main.STATE.keys(main.BOOKED_APPOINTMENTS_NS)),
+        "flagged": len(main.STATE.keys(main.FLAGGED_RESPONSES_NS)),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "memory_growth_bytes": after_traced - before_traced,
+        "memory_peak_bytes": peak_traced,
+        "state_growth_bytes": {key: after_sizes[key] - before_sizes[key] for key in after_sizes},
+        "llm_latency": config.llm_latency,
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print("=== Load Test =========================")
+    print(f"payloads:          {result['payloads']} ({result['http_non_200']} non-200)")
+    print(f"replies/bookings:  {result['replies']} / {result['bookings']} (flagged {result['flagged']})")
+    print(f"elapsed:           {result['elapsed_seconds']:.2f}s (ingest {result['ingest_seconds']:.2f}s)")
+    print(f"throughput:        {result['messages_per_second']:.1f} msg/s")
+    print(
+        "end-to-end:        "
+        f"p50 {result['latency_p50'] * 1000:.0f}ms  "
+        f"p95 {result['latency_p95'] * 1000:.0f}ms  "
+        f"p99 {result['latency_p99'] * 1000:.0f}ms"
+    )
+    print(
+        f"memory:            +{result['memory_growth_bytes'] / 1024:.1f} KiB "
+        f"(peak {result['memory_peak_bytes'] / 1024:.1f} KiB)"
+    )
+    for key, growth in result["state_growth_bytes"].items():
+        print(f"  {key + ':':<17}+{growth / 1024:.1f} KiB")
+    print("=======================================")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=50, help="distinct email threads")
+    parser.add_argument("--rate", type=float, default=0, help="payloads/sec to offer (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent HTTP senders")
+    parser.add_argument("--workers", type=int, default=4, help="PROCESSING_WORKERS for the app")
+    parser.add_argument("--schedule-ratio", type=float, default=0.4)
+    parser.add_argument("--emergency-ratio", type=float, default=0.05)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1)
+    parser.add_argument("--outbound-ratio", type=float, default=0.1)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--calendar-latency", type=float, default=0.05)
+    parser.add_argument("--mail-latency", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verbose", action="store_true", help="show app logs (INFO and above)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    print_report(run(parse_args()))
@@ -0,0 +1,364 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from StateStore import StateStore
+
+# Comment: latency buckets (seconds) spanning dict lookups up to slow LLM turns
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def samples(self) -> Dict[LabelValues, Any]:
+        """Current JSON-serializable value per label set."""
+
+    @abstractmethod
+    def format_samples(self, samples: Dict[LabelValues, Any]) -> List[str]:
+        """The sample lines for ``samples``, without the HELP/TYPE header."""
+
+    def combine(self, left: Any, right: Any) -> Any:
+        """Merge the same series from two processes."""
+        return left + right
+
+    def render(self) -> List[str]:
+        return self.format_samples(self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return dict(self._values)
+
+    def format_samples(self, samples: Dict[LabelValues, Any]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in samples.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Comment: read the value lazily at scrape time instead of on every change."""
+        self._function = function
+
+    def samples(self) -> Dict[LabelValues, Any]:
+        if self._function is not None:
+            return {(): self._function()}
+        with self._lock:
+            return dict(self._values)
+
+    def format_samples(self, samples: Dict[LabelValues, Any]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in samples.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Comment: per-label [bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def samples(self) -> Dict[LabelValues, Any]:
+        """Per label set, the bucket counts followed by the sum."""
+        with self._lock:
+            return {key: counts + [self._sums[key]] for key, counts in self._counts.items()}
+
+    def combine(self, left: Any, right: Any) -> Any:
+        return [a + b for a, b in zip(left, right)]
+
+    def format_samples(self, samples: Dict[LabelValues, Any]) -> List[str]:
+        lines: List[str] = []
+        for key, values in samples.items():
+            counts, total = values[:-1], values[-1]
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, List[List[Any]]]:
+        """Every series as JSON (metric name -> [[label values, value], ...]) for sharing between processes."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: [[list(key), value] for key, value in metric.samples().items()] for metric in metrics}
+
+    def render_merged(self, snapshots: Iterable[Tuple[Dict[str, List[List[Any]]], bool]]) -> str:
+        """Render the sum of several processes' snapshots, given as ``(snapshot, live)`` pairs.
+
+        Counters and histograms include every snapshot so totals never go backwards;
+        gauges describe the present, so only live processes count towards them.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        merged: Dict[str, Dict[LabelValues, Any]] = {metric.name: {} for metric in metrics}
+        by_name = {metric.name: metric for metric in metrics}
+        for snapshot, live in snapshots:
+            for name, series in snapshot.items():
+                metric = by_name.get(name)
+                if metric is None or (metric.kind == "gauge" and not live):
+                    continue
+                for labels, value in series:
+                    key = tuple(labels)
+                    current = merged[name].get(key)
+                    merged[name][key] = value if current is None else metric.combine(current, value)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.format_samples(merged[metric.name]))
+        return "\n".join(lines) + "\n"
+
+
+class SharedMetrics:
+    """Expose one set of numbers no matter which worker process answers the scrape.
+
+    Every process publishes its registry snapshot to the shared StateStore on a timer
+    (and when it serves a scrape); ``render`` sums all published snapshots. Processes that
+    stopped publishing keep contributing their counters and histograms until
+    ``retain_seconds`` have passed, but no longer count towards gauges.
+    """
+
+    def __init__(
+        self,
+        registry: Registry,
+        store: StateStore,
+        namespace: str = "metrics",
+        interval: float = 5.0,
+        retain_seconds: float = 24 * 3600,
+    ):
+        self.registry = registry
+        self.store = store
+        self.namespace = namespace
+        self.interval = interval
+        self.retain_seconds = retain_seconds
+        self._lock = Lock()
+        self._pid: Optional[int] = None
+        self._instance = ""
+        self._publisher_pid: Optional[int] = None
+
+    def _instance_key(self) -> str:
+        # Comment: pid plus start time, so a recycled pid never overwrites an older process's totals
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._instance = f"{self._pid}-{time.time_ns()}"
+            return self._instance
+
+    def publish(self) -> None:
+        self.store.set(self.namespace, self._instance_key(), {"at": time.time(), "metrics": self.registry.snapshot()})
+
+    def start(self) -> None:
+        """Publish on a background thread; safe to call more than once per process."""
+        with self._lock:
+            if self._publisher_pid == os.getpid():
+                return
+            self._publisher_pid = os.getpid()
+        Thread(target=self._publish_forever, name="metrics-publisher", daemon=True).start()
+
+    def _publish_forever(self) -> None:
+        while True:
+            try:
+                self.publish()
+            except Exception:
+                # Comment: a missed publish only makes this worker's numbers a few seconds older
+                pass
+            time.sleep(self.interval)
+
+    def render(self) -> str:
+        self.publish()
+        now = time.time()
+        snapshots = []
+        for instance, published in self.store.items(self.namespace).items():
+            age = now - published["at"]
+            if age > self.retain_seconds:
+                self.store.pop(self.namespace, instance)
+                continue
+            snapshots.append((published["metrics"], age < self.interval * 3))
+        return self.registry.render_merged(snapshots)
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "careinbox_stage_seconds", "Time spent in each message-processing stage.", ("stage",)
+)
+TOOL_SECONDS = REGISTRY.histogram(
+    "careinbox_tool_call_seconds", "Time spent in each agent tool call.", ("tool",)
+)
+MESSAGES_TOTAL = REGISTRY.counter(
+    "careinbox_messages_total", "Processed payloads by outcome.", ("outcome",)
+)
+TOKENS_TOTAL = REGISTRY.counter(
+    "careinbox_llm_tokens_total", "LLM token usage by kind.", ("kind",)
+)
+AVAILABILITY_TOTAL = REGISTRY.counter(
+    "careinbox_availability_lookups_total",
+    "How schedule_appointment got availability (fresh, waited on prefetch, fetched) and prefetches started.",
+    ("result",),
+)
+FAST_PATH_TOTAL = REGISTRY.counter(
+    "careinbox_scheduling_fast_path_total",
+    "Replies in threads with offered slots: booked without the agent, or why the agent was used.",
+    ("result",),
+)
+QUEUE_DEPTH = REGISTRY.gauge("careinbox_queue_depth", "Payloads waiting in the processing queue.")
+RUNS_IN_FLIGHT = REGISTRY.gauge("careinbox_agent_runs_in_flight", "Agent runs currently executing.")
+
+
+# Comment: per-message stage totals, collected only while a flight recording is active
+_STAGE_TIMINGS: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block and record it under ``careinbox_stage_seconds{stage=...}``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _STAGE_TIMINGS.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+@contextmanager
+def collect_stage_timings() -> Iterator[Dict[str, float]]:
+    """Also sum every span in this context into the yielded dict (stage -> seconds)."""
+    timings: Dict[str, float] = {}
+    token = _STAGE_TIMINGS.set(timings)
+    try:
+        yield timings
+    finally:
+        _STAGE_TIMINGS.reset(token)
@@ -0,0 +1,163 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from threading import Event, Thread
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from agentmail import AgentMail
+
+from StructuredLogging import get_logger, log_event
+
+log = get_logger("polling")
+
+
+class MessagePoller:
+    """Pull new inbound messages from AgentMail instead of waiting for webhooks.
+
+    Every cycle lists messages newer than the cursor (oldest first), fetches the
+    full bodies in parallel and hands webhook-shaped payloads to ``submit`` so
+    they flow through the same processing queue as ``/webhooks``.
+
+    With ``load_cursor``/``save_cursor`` the cursor outlives the process, so mail
+    that arrives during a restart (or a leader change) is picked up afterwards.
+    """
+
+    def __init__(
+        self,
+        client: AgentMail,
+        inbox_id: str,
+        submit: Callable[[Dict[str, Any]], Any],
+        *,
+        min_interval: float = 1.0,
+        max_interval: float = 30.0,
+        backoff: float = 2.0,
+        batch_size: int = 50,
+        fetch_workers: int = 8,
+        labels: Optional[List[str]] = None,
+        start_from: Optional[datetime] = None,
+        is_leader: Optional[Callable[[], bool]] = None,
+        load_cursor: Optional[Callable[[], Optional[Tuple[datetime, List[str]]]]] = None,
+        save_cursor: Optional[Callable[[datetime, List[str]], None]] = None,
+    ):
+        self.client = client
+        self.inbox_id = inbox_id
+        self.submit = submit
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.labels = labels if labels is not None else ["received"]
+        # Comment: with several worker processes only the lease holder polls; the rest stand by
+        self.is_leader = is_leader or (lambda: True)
+        self.load_cursor = load_cursor
+        self.save_cursor = save_cursor
+        # Comment: message ids sharing the cursor timestamp, in case `after` is inclusive
+        self._seen_at_cursor: Set[str] = set()
+        saved = load_cursor() if load_cursor else None
+        if saved is not None:
+            self.cursor, seen = saved
+            self._seen_at_cursor = set(seen)
+        else:
+            # Comment: the very first run only picks up mail that arrives after startup unless told otherwise
+            self.cursor = start_from or datetime.now(timezone.utc)
+        self.interval = min_interval
+        self._fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="poll-fetch")
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="message-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._fetch_pool.shutdown(wait=False)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self.is_leader():
+                self._stop.wait(self.max_interval)
+                continue
+            try:
+                found = self.poll_once()
+            except Exception as e:
+                log_event(log, logging.WARNING, "poll_failed", error=str(e))
+                found = 0
+            # Comment: poll fast while mail is flowing, back off while the inbox is idle
+            if found:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+            self._stop.wait(self.interval)
+
+    def poll_once(self) -> int:
+        """List everything newer than the cursor, page by page, and submit it."""
+        submitted = 0
+        page_token: Optional[str] = None
+        self._adopt_saved_cursor()
+        # Comment: keep the query stable while paging; the cursor moves as items are submitted
+        after = self.cursor
+        while True:
+            page = self.client.inboxes.messages.list(
+                inbox_id=self.inbox_id,
+                limit=self.batch_size,
+                page_token=page_token,
+                labels=self.labels or None,
+                after=after,
+                ascending=True,
+            )
+            items = [item for item in page.messages if item.message_id not in self._seen_at_cursor]
+            submitted += self._submit_batch(items)
+            page_token = page.next_page_token
+            if not page_token or self._stop.is_set():
+                return submitted
+
+    def _submit_batch(self, items: List[Any]) -> int:
+        if not items:
+            return 0
+        # Comment: list results only carry previews, so fetch full bodies concurrently
+        messages = self._fetch_pool.map(
+            lambda item: self.client.inboxes.messages.get(inbox_id=self.inbox_id, message_id=item.message_id),
+            items,
+        )
+        for item, message in zip(items, messages):
+            self.submit(message_to_payload(message))
+            self._advance_cursor(item.timestamp, item.message_id)
+        if self.save_cursor:
+            self.save_cursor(self.cursor, sorted(self._seen_at_cursor))
+        return len(items)
+
+    def _adopt_saved_cursor(self) -> None:
+        """Comment: another worker may have held the lease since our last poll; continue from where it stopped."""
+        saved = self.load_cursor() if self.load_cursor else None
+        if saved is None:
+            return
+        cursor, seen = saved
+        if cursor > self.cursor:
+            self.cursor, self._seen_at_cursor = cursor, set(seen)
+        elif cursor == self.cursor:
+            self._seen_at_cursor.update(seen)
+
+    def _advance_cursor(self, timestamp: datetime, message_id: str) -> None:
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        if timestamp > self.cursor:
+            self.cursor = timestamp
+            self._seen_at_cursor = {message_id}
+        elif timestamp == self.cursor:
+            self._seen_at_cursor.add(message_id)
+
+
+def message_to_payload(message: Any) -> Dict[str, Any]:
+    """Wrap a fetched message in the same envelope AgentMail webhooks deliver."""
+    email = message.model_dump(mode="json", by_alias=True)
+    return {
+        "event_type": "message.received",
+        "event_id": f"poll:{email.get('message_id', '')}",
+        "message": email,
+    }
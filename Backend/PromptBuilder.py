@@ -0,0 +1,59 @@
+import re
+from typing import Any, Dict
+
+# Comment: lines that start the quoted copy of an earlier message
+_REPLY_HEADER = re.compile(
+    r"^\s*(On\b.*\bwrote:"
+    r"|-{2,}\s*Original Message\s*-{2,}"
+    r"|-{2,}\s*Forwarded message\s*-{2,}"
+    r"|_{10,})\s*$",
+    re.IGNORECASE,
+)
+# Comment: "On <date>, <name>" often wraps so that "wrote:" lands on the next line
+_REPLY_HEADER_START = re.compile(r"^\s*On\b.*\d", re.IGNORECASE)
+_WROTE_LINE = re.compile(r"^.*\bwrote:\s*$", re.IGNORECASE)
+# Comment: Outlook-style header block ("From: ..." followed by "Sent:"/"Date:")
+_OUTLOOK_FROM = re.compile(r"^\s*From:\s.+$", re.IGNORECASE)
+_OUTLOOK_NEXT = re.compile(r"^\s*(Sent|Date):\s", re.IGNORECASE)
+# Comment: conventional "-- " delimiter plus common mobile sign-offs
+_SIGNATURE = re.compile(r"^\s*(--|Sent from my \w+.*|Get Outlook for \w+.*)\s*$", re.IGNORECASE)
+_BLANK_RUN = re.compile(r"\n{3,}")
+
+TRUNCATION_MARKER = "[message truncated]"
+
+
+def strip_quoted_text(body: str) -> str:
+    """Drop quoted reply chains; the thread memory already holds earlier turns."""
+    lines = body.splitlines()
+    kept = []
+    for index, line in enumerate(lines):
+        next_line = lines[index + 1] if index + 1 < len(lines) else ""
+        if _REPLY_HEADER.match(line):
+            break
+        if _REPLY_HEADER_START.match(line) and _WROTE_LINE.match(next_line):
+            break
+        if _OUTLOOK_FROM.match(line) and _OUTLOOK_NEXT.match(next_line):
+            break
+        if line.lstrip().startswith(">"):
+            continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def strip_signature(body: str) -> str:
+    lines = body.splitlines()
+    for index, line in enumerate(lines):
+        if _SIGNATURE.match(line):
+            return "\n".join(lines[:index])
+    return body
+
+
+def clean_body(email: Dict[str, Any], max_chars: int) -> str:
+    """The new content of an email: no quoted history, no signature, at most ``max_chars``."""
+    # Comment: AgentMail already extracts the new reply text for most messages
+    body = email.get("extracted_text") or email.get("text") or ""
+    body = strip_signature(strip_quoted_text(body))
+    body = _BLANK_RUN.sub("\n\n", body).strip()
+    if len(body) > max_chars:
+        body = body[:max_chars].rstrip() + f"\n{TRUNCATION_MARKER}"
+    return body
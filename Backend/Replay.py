@@ -0,0 +1,199 @@
+"""Replay flight recordings against /webhooks with every upstream faked.
+
+    python Replay.py recordings/ --speed 10
+
+Recorded arrival gaps and model time are divided by ``--speed`` (0 = no waiting at all).
+Tool calls are re-issued with their recorded arguments, so scheduling runs the real code.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import Fakes
+from FlightRecorder import placeholder, read_flights
+from LoadTest import percentile
+
+
+def stage_percentiles(flights: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    samples: Dict[str, List[float]] = defaultdict(list)
+    for flight in flights:
+        for stage, seconds in (flight.get("stages") or {}).items():
+            samples[stage].append(seconds)
+    return {
+        stage: {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+        for stage, values in sorted(samples.items())
+    }
+
+
+def model_seconds(flight: Dict[str, Any]) -> float:
+    """Time the recorded agent run spent outside tools, i.e. waiting on the model."""
+    agent_run = (flight.get("stages") or {}).get("agent_run", 0.0)
+    return max(0.0, agent_run - sum(call["seconds"] for call in flight.get("tool_calls") or []))
+
+
+def make_script(flights: Dict[str, Dict[str, Any]], speed: float, main: Any) -> Fakes.AgentScript:
+    """An agent script that repeats each recorded run: same tool calls, same model time, same outcome."""
+
+    def scaled(seconds: float) -> float:
+        return seconds / speed if speed > 0 else 0.0
+
+    async def script(input_items: List[Dict[str, Any]], call_tool: Fakes.ToolCaller) -> str:
+        flight = flights.get(main.CURRENT_MESSAGE_ID.get())
+        if flight is None:
+            return await Fakes.default_script(input_items, call_tool)
+        available = {tool.name for tool in main.get_agent().tools}
+        calls = flight.get("tool_calls") or []
+        # Comment: spread model time evenly over the turns around each tool call
+        turn = scaled(model_seconds(flight) / (len(calls) + 1))
+        for call in calls:
+            await asyncio.sleep(turn)
+            if call["tool"] in available:
+                await call_tool(call["tool"], **placeholder(call.get("arguments") or {}))
+            else:
+                # Comment: tools the fakes don't provide (AgentMail's) only cost their recorded time
+                await asyncio.sleep(scaled(call["seconds"]))
+        await asyncio.sleep(turn)
+        final_output = placeholder(flight.get("final_output") or "")
+        if flight.get("outcome") == "flagged":
+            return json.dumps({"emergency": True, "message": final_output})
+        return final_output
+
+    return script
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    recorded = read_flights(args.directory)
+    if args.limit:
+        recorded = recorded[:args.limit]
+    if not recorded:
+        raise SystemExit(f"No flight recordings in {args.directory}")
+    by_message = {flight["message_id"]: flight for flight in recorded}
+
+    config = Fakes.install_fakes(Fakes.FakeConfig(
+        llm_latency=0.0,
+        llm_jitter=0.0,
+        calendar_latency=args.calendar_latency,
+        mail_latency=args.mail_latency,
+    ))
+    os.environ.setdefault("INBOX_USERNAME", "replay")
+    if not args.verbose:
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["PROCESSING_WORKERS"] = str(args.workers)
+    os.environ["PROCESSING_QUEUE_SIZE"] = str(max(len(recorded) * 2, 1000))
+    # Comment: the replay records itself, so its stage timings can be compared with the original
+    os.environ["FLIGHT_RECORDER_DIR"] = args.record_to or tempfile.mkdtemp(prefix="careinbox-replay-")
+    Fakes.seed_busy_calendar(datetime(2025, 9, 28, 10, 0, tzinfo=timezone(timedelta(hours=-4))))
+
+    import main
+
+    config.script = make_script(by_message, args.speed, main)
+    main.warm_up()
+    app = main.create_app(warm=False)
+    messages_api = main.get_client().inboxes.messages
+    posted_at: Dict[str, float] = {}
+
+    def post(payload: Dict[str, Any]) -> int:
+        posted_at.setdefault(payload["message"]["message_id"], time.perf_counter())
+        with app.test_client() as http:
+            return http.post("/webhooks", json=payload).status_code
+
+    first_arrival = recorded[0]["recorded_at"]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = []
+        for flight in recorded:
+            if args.speed > 0:
+                delay = started + (flight["recorded_at"] - first_arrival) / args.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            payload = placeholder(flight["payload"])
+            # Comment: the recorded queue time is not traffic; let the replay measure its own
+            payload.pop("received_at", None)
+            futures.append(pool.submit(post, payload))
+        statuses = [future.result() for future in futures]
+        main.PROCESSING_QUEUE.join()
+    finished = time.perf_counter()
+    main.RECORDER.close()
+
+    replayed = read_flights(os.environ["FLIGHT_RECORDER_DIR"])
+    latencies = [
+        replied - posted_at[message_id]
+        for message_id, replied in messages_api.replied_at.items()
+        if message_id in posted_at
+    ]
+    outcomes: Dict[str, Dict[str, int]] = {"recorded": defaultdict(int), "replayed": defaultdict(int)}
+    for side, flights in (("recorded", recorded), ("replayed", replayed)):
+        for flight in flights:
+            outcomes[side][flight.get("outcome", "unknown")] += 1
+    return {
+        "flights": len(recorded),
+        "http_non_200": sum(1 for status in statuses if status != 200),
+        "speed": args.speed,
+        "elapsed_seconds": finished - started,
+        "recorded_span_seconds": recorded[-1]["recorded_at"] - first_arrival,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "outcomes": {side: dict(counts) for side, counts in outcomes.items()},
+        "stages": {"recorded": stage_percentiles(recorded), "replayed": stage_percentiles(replayed)},
+        "replay_recording": os.environ["FLIGHT_RECORDER_DIR"],
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print("=== Replay ============================")
+    print(f"flights:           {result['flights']} ({result['http_non_200']} non-200)")
+    print(
+        f"elapsed:           {result['elapsed_seconds']:.2f}s "
+        f"(recorded span {result['recorded_span_seconds']:.2f}s, speed {result['speed']:g}x)"
+    )
+    print(f"outcomes:          recorded {result['outcomes']['recorded']}")
+    print(f"                   replayed {result['outcomes']['replayed']}")
+    print(
+        "end-to-end:        "
+        f"p50 {result['latency_p50'] * 1000:.0f}ms  "
+        f"p95 {result['latency_p95'] * 1000:.0f}ms  "
+        f"p99 {result['latency_p99'] * 1000:.0f}ms"
+    )
+    print("stage                 recorded p50/p95      replayed p50/p95")
+    recorded, replayed = result["stages"]["recorded"], result["stages"]["replayed"]
+    for stage in sorted(set(recorded) | set(replayed)):
+        before = recorded.get(stage, {"p50": 0.0, "p95": 0.0})
+        after = replayed.get(stage, {"p50": 0.0, "p95": 0.0})
+        print(
+            f"  {stage:<20}{before['p50'] * 1000:>8.1f}/{before['p95'] * 1000:<8.1f}ms "
+            f"{after['p50'] * 1000:>8.1f}/{after['p95'] * 1000:<8.1f}ms"
+        )
+    print(f"replay recording:  {result['replay_recording']}")
+    print("=======================================")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="FLIGHT_RECORDER_DIR of the recording to replay")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression (1 = original, 0 = no waits)")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N flights")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent HTTP senders")
+    parser.add_argument("--workers", type=int, default=4, help="PROCESSING_WORKERS for the app")
+    parser.add_argument("--calendar-latency", type=float, default=0.05)
+    parser.add_argument("--mail-latency", type=float, default=0.02)
+    parser.add_argument("--record-to", help="where the replay writes its own recording (default: a temp dir)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON for diffing versions")
+    parser.add_argument("--verbose", action="store_true", help="show app logs (INFO and above)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    outcome = run(arguments)
+    if arguments.json:
+        print(json.dumps(outcome, indent=2))
+    else:
+        print_report(outcome)
@@ -0,0 +1,145 @@
+import re
+from datetime import tzinfo
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from SlotKeys import CLINIC_TIMEZONE, from_key
+
+# Comment: anything longer is a real message, not a bare pick, and goes to the agent
+MAX_CHOICE_CHARS = 200
+# Comment: the clinic opens at 9, so a bare "2:00" means 2 PM
+OPENING_HOUR = 9
+
+_TIME = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*([ap])\.?\s*m\b\.?|\b(\d{1,2}):(\d{2})\b|\b(noon)\b")
+_MONTHS = (
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+)
+_MONTH_DAY = re.compile(
+    r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b"
+)
+_NUMERIC_DATE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/\d{2,4})?\b")
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_WEEKDAY = re.compile(r"\b(mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)(?:day|nesday|rsday|urday|sday)?\b")
+_WORD = re.compile(r"[a-z']+|\d+")
+
+# Comment: words that say "yes" on their own; without a time they only confirm a single offered slot
+_CONFIRM_WORDS = frozenset({
+    "yes", "yeah", "yep", "yup", "sure", "confirm", "confirmed", "book", "works",
+})
+# Comment: acknowledgements ("ok thanks", "great") are fine next to a time but never confirm one alone
+_ACKNOWLEDGEMENT_WORDS = frozenset({
+    "awesome", "fine", "good", "great", "ok", "okay", "perfect",
+})
+# Comment: every other word a bare pick may contain; anything outside this list goes to the agent
+_FILLER_WORDS = _CONFIRM_WORDS | _ACKNOWLEDGEMENT_WORDS | frozenset({
+    "a", "am", "an", "appointment", "at", "be", "day", "do", "for", "go", "hi", "hello", "i", "i'd",
+    "i'll", "id", "ill", "is", "it", "let's", "lets", "like", "me", "morning", "afternoon", "on", "one",
+    "please", "pm", "slot", "sounds", "take", "thank", "thanks", "that", "the", "this", "time", "to", "want",
+    "we'll", "will", "with", "would", "you",
+})
+
+
+def _clock(match: "re.Match[str]") -> Tuple[int, int]:
+    if match.group(6):
+        return 12, 0
+    if match.group(3):
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        hour = hour % 12 + (12 if match.group(3) == "p" else 0)
+        return hour, minute
+    hour, minute = int(match.group(4)), int(match.group(5))
+    if hour < OPENING_HOUR:
+        hour += 12
+    return hour, minute
+
+
+def match_offered_slot(
+    text: str,
+    offered: List[int],
+    extra_words: Iterable[str] = (),
+    tz: tzinfo = CLINIC_TIMEZONE,
+) -> Optional[int]:
+    """Return the offered slot key the reply unambiguously picks, else None.
+
+    The reply must consist only of times, dates, weekdays, confirmation words and
+    ``extra_words`` (e.g. the patient's name). Every mention narrows the offered slots
+    and exactly one may remain; "yes" alone only counts when a single slot was offered.
+    """
+    text = (text or "").strip().lower()
+    if not text or not offered or len(text) > MAX_CHOICE_CHARS or "?" in text:
+        return None
+
+    clocks: Set[Tuple[int, int]] = set()
+    dates: Set[Tuple[int, int]] = set()
+    weekdays: Set[int] = set()
+
+    def take_clock(match: "re.Match[str]") -> str:
+        clocks.add(_clock(match))
+        return " "
+
+    def take_month_day(match: "re.Match[str]") -> str:
+        prefix = match.group(1)[:3]
+        month = next(index for index, name in enumerate(_MONTHS, 1) if name.startswith(prefix))
+        dates.add((month, int(match.group(2))))
+        return " "
+
+    def take_numeric_date(match: "re.Match[str]") -> str:
+        dates.add((int(match.group(1)), int(match.group(2))))
+        return " "
+
+    def take_weekday(match: "re.Match[str]") -> str:
+        prefix = match.group(1)[:3]
+        weekdays.add(next(index for index, name in enumerate(_WEEKDAYS) if name.startswith(prefix)))
+        return " "
+
+    rest = _TIME.sub(take_clock, text)
+    rest = _MONTH_DAY.sub(take_month_day, rest)
+    rest = _NUMERIC_DATE.sub(take_numeric_date, rest)
+    rest = _WEEKDAY.sub(take_weekday, rest)
+
+    allowed = _FILLER_WORDS | {word.lower() for word in extra_words}
+    words = _WORD.findall(rest)
+    # Comment: stray numbers ("the 2"), negations, questions and other content are not a clear pick
+    if any(word not in allowed for word in words):
+        return None
+    if len(clocks) > 1 or len(dates) > 1 or len(weekdays) > 1:
+        return None
+
+    if not (clocks or dates or weekdays):
+        if len(offered) == 1 and _CONFIRM_WORDS.intersection(words):
+            return offered[0]
+        return None
+
+    candidates = []
+    for key in offered:
+        local = from_key(key, tz)
+        if clocks and (local.hour, local.minute) not in clocks:
+            continue
+        if dates and (local.month, local.day) not in dates:
+            continue
+        if weekdays and local.weekday() not in weekdays:
+            continue
+        candidates.append(key)
+    return candidates[0] if len(candidates) == 1 else None
+
+
+CONFIRMATION_TEMPLATE = """Hi {first_name},
+
+You're booked for {when} (UTC-4) with {provider} at {location}.
+
+Confirmation ID: {confirmation_id}
+
+If you need to reschedule or cancel, just reply to this email.
+
+CareInbox"""
+
+
+def render_confirmation(appointment: Dict[str, Any], slot_key: int, tz: tzinfo = CLINIC_TIMEZONE) -> str:
+    """The booking reply, following the agent's style rules (full date with year, provider, location, ID)."""
+    local = from_key(slot_key, tz)
+    return CONFIRMATION_TEMPLATE.format(
+        first_name=(appointment.get("patient") or "there").split()[0],
+        when=f"{local.strftime('%A, %B %d, %Y')} at {local.strftime('%I:%M %p')}",
+        provider=appointment["provider"],
+        location=appointment["location"],
+        confirmation_id=appointment["confirmation_id"],
+    )
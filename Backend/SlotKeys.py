@@ -0,0 +1,108 @@
+import re
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Comment: the clinic runs on a fixed UTC-4 offset; naive inputs are read in this zone
+CLINIC_TIMEZONE = timezone(timedelta(hours=-4))
+# Comment: a date with no time (or midnight) means the clinic's opening hour
+DEFAULT_HOUR = 9
+
+# Comment: formats the model commonly produces besides ISO 8601, tried in order
+_STRPTIME_FORMATS: Tuple[str, ...] = (
+    "%Y-%m-%d %I:%M %p",
+    "%Y-%m-%d %I %p",
+    "%Y-%m-%dT%I:%M %p",
+    "%m/%d/%Y %I:%M %p",
+    "%m/%d/%Y %H:%M",
+    "%B %d, %Y %I:%M %p",
+    "%B %d, %Y at %I:%M %p",
+    "%B %d %Y %I:%M %p",
+    "%b %d, %Y %I:%M %p",
+    "%b %d, %Y at %I:%M %p",
+    "%A, %B %d, %Y %I:%M %p",
+    "%A, %B %d, %Y at %I:%M %p",
+    "%A %B %d, %Y %I:%M %p",
+    "%A %B %d, %Y at %I:%M %p",
+)
+# Comment: trailing zone labels that just restate the clinic's zone
+_CLINIC_ZONE_SUFFIX = re.compile(r"\s*\(?\b(UTC|GMT)\s*[-−]\s*0?4(:00)?\)?\s*$|\s*\(?\b(EDT|ET)\)?\s*$", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_AM_PM = re.compile(r"(\d)\s*([ap])\.?m\b\.?", re.IGNORECASE)
+
+
+class SlotParseError(ValueError):
+    """A preferred slot the parser could not turn into a point in time."""
+
+    def __init__(self, raw: str, reason: str):
+        super().__init__(f"{reason}: {raw!r}")
+        self.raw = raw
+        self.reason = reason
+
+    def to_dict(self) -> dict:
+        return {"input": self.raw, "error": self.reason}
+
+
+def to_key(moment: datetime) -> int:
+    """Epoch minutes for an aware datetime; the internal slot representation."""
+    return int(moment.timestamp()) // 60
+
+
+def from_key(key: int, tz: tzinfo = CLINIC_TIMEZONE) -> datetime:
+    return datetime.fromtimestamp(key * 60, tz)
+
+
+def key_to_iso(key: int, tz: tzinfo = CLINIC_TIMEZONE) -> str:
+    """Render a slot key the way the agent and patients see it (clinic-local ISO, minutes)."""
+    return from_key(key, tz).isoformat(timespec="minutes")
+
+
+def parse_instant(value: str) -> Optional[int]:
+    """Key for an offset-qualified ISO timestamp (e.g. calendar event times); None if malformed."""
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return to_key(moment)
+
+
+def _parse_datetime(candidate: str) -> Optional[datetime]:
+    try:
+        # Comment: covers "2025-09-29", "2025-09-29T10:00", "... 10:00:00Z" and any explicit offset
+        return datetime.fromisoformat(candidate)
+    except ValueError:
+        pass
+    text = _AM_PM.sub(lambda match: f"{match.group(1)} {match.group(2).upper()}M", candidate)
+    for fmt in _STRPTIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=4096)
+def parse_slot(raw: str, tz: tzinfo = CLINIC_TIMEZONE) -> int:
+    """Parse a preferred slot into its key; memoized because the model repeats the same strings.
+
+    Naive inputs are read in ``tz``. Raises SlotParseError for anything unrecognized.
+    """
+    candidate = _WHITESPACE.sub(" ", raw or "").strip()
+    if not candidate:
+        raise SlotParseError(raw, "empty slot")
+    # Comment: a trailing clinic-zone label carries no extra information once naive means clinic-local
+    candidate = _CLINIC_ZONE_SUFFIX.sub("", candidate)
+
+    parsed = _parse_datetime(candidate)
+    if parsed is None:
+        raise SlotParseError(raw, "unrecognized date/time format")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+
+    local = parsed.astimezone(tz).replace(second=0, microsecond=0)
+    # Comment: if time is midnight (00:00), default to 9 AM clinic opening time
+    if local.hour == 0 and local.minute == 0:
+        local = local.replace(hour=DEFAULT_HOUR)
+    return to_key(local)
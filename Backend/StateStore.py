@@ -0,0 +1,251 @@
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock, RLock, local
+from typing import Any, Dict, List, Optional
+
+
+class StateStore(ABC):
+    """Namespaced key/value state shared by every worker process.
+
+    Values must be JSON-serializable. Operations that other workers may race on
+    (``claim``, ``pop``, ``incr``, ``replace``, ``acquire_lease``) are atomic.
+    """
+
+    @abstractmethod
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    def pop(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Remove ``key`` and return its value, or ``default`` if another worker got there first."""
+
+    @abstractmethod
+    def contains(self, namespace: str, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def claim(self, namespace: str, key: str, value: Any = None, max_items: Optional[int] = None) -> bool:
+        """Insert ``key`` only if absent; True for the caller that inserted it.
+
+        With ``max_items``, the oldest claims are evicted once the namespace grows past it.
+        """
+
+    @abstractmethod
+    def items(self, namespace: str) -> Dict[str, Any]:
+        ...
+
+    def keys(self, namespace: str) -> List[str]:
+        return list(self.items(namespace))
+
+    @abstractmethod
+    def replace(self, namespace: str, mapping: Dict[str, Any]) -> None:
+        """Swap the whole namespace for ``mapping`` in one step."""
+
+    @abstractmethod
+    def incr(self, namespace: str, key: str, amount: int = 1) -> int:
+        ...
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew a named lease; True while ``owner`` holds it."""
+
+
+class MemoryStateStore(StateStore):
+    """Single-process store; the default for ``python main.py`` and tests."""
+
+    def __init__(self):
+        self._data: Dict[str, "OrderedDict[str, Any]"] = {}
+        self._lock = RLock()
+
+    def _namespace(self, namespace: str) -> "OrderedDict[str, Any]":
+        data = self._data.get(namespace)
+        if data is None:
+            data = self._data[namespace] = OrderedDict()
+        return data
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._namespace(namespace).get(key, default)
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        with self._lock:
+            self._namespace(namespace)[key] = value
+
+    def pop(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._namespace(namespace).pop(key, default)
+
+    def contains(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            return key in self._namespace(namespace)
+
+    def claim(self, namespace: str, key: str, value: Any = None, max_items: Optional[int] = None) -> bool:
+        with self._lock:
+            data = self._namespace(namespace)
+            if key in data:
+                return False
+            data[key] = value
+            if max_items is not None:
+                while len(data) > max_items:
+                    data.popitem(last=False)
+            return True
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._namespace(namespace))
+
+    def replace(self, namespace: str, mapping: Dict[str, Any]) -> None:
+        with self._lock:
+            self._data[namespace] = OrderedDict(mapping)
+
+    def incr(self, namespace: str, key: str, amount: int = 1) -> int:
+        with self._lock:
+            data = self._namespace(namespace)
+            data[key] = int(data.get(key, 0)) + amount
+            return data[key]
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            leases = self._namespace("_leases")
+            holder = leases.get(name)
+            if holder is None or holder["owner"] == owner or holder["expires"] < now:
+                leases[name] = {"owner": owner, "expires": now + ttl}
+                return True
+            return False
+
+
+class SQLiteStateStore(StateStore):
+    """Store backed by one SQLite file in WAL mode, shared by every worker on the host."""
+
+    # Comment: evict over-capacity claims every N inserts rather than on every one
+    TRIM_EVERY = 100
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = local()
+        # Comment: per namespace, so a busy namespace can't starve another's trim
+        self._claims_since_trim: Dict[str, int] = {}
+        self._trim_lock = Lock()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT,"
+                " PRIMARY KEY (namespace, key))"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Comment: one connection per thread; sqlite3 connections must not be shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        row = self._connection().execute(
+            "SELECT value FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        self._connection().execute(
+            "INSERT INTO state (namespace, key, value) VALUES (?, ?, ?)"
+            " ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value",
+            (namespace, key, json.dumps(value)),
+        )
+
+    def pop(self, namespace: str, key: str, default: Any = None) -> Any:
+        row = self._connection().execute(
+            "DELETE FROM state WHERE namespace = ? AND key = ? RETURNING value", (namespace, key)
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def contains(self, namespace: str, key: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return row is not None
+
+    def claim(self, namespace: str, key: str, value: Any = None, max_items: Optional[int] = None) -> bool:
+        conn = self._connection()
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO state (namespace, key, value) VALUES (?, ?, ?)",
+            (namespace, key, json.dumps(value)),
+        ).rowcount == 1
+        if inserted and max_items is not None:
+            with self._trim_lock:
+                claims = self._claims_since_trim.get(namespace, 0) + 1
+                self._claims_since_trim[namespace] = 0 if claims >= self.TRIM_EVERY else claims
+            if claims >= self.TRIM_EVERY:
+                # Comment: rowid grows with insertion order, so the lowest rowids are the oldest claims
+                conn.execute(
+                    "DELETE FROM state WHERE rowid IN ("
+                    " SELECT rowid FROM state WHERE namespace = ? ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                    (namespace, max_items),
+                )
+        return inserted
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        rows = self._connection().execute(
+            "SELECT key, value FROM state WHERE namespace = ? ORDER BY rowid", (namespace,)
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def replace(self, namespace: str, mapping: Dict[str, Any]) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM state WHERE namespace = ?", (namespace,))
+            conn.executemany(
+                "INSERT INTO state (namespace, key, value) VALUES (?, ?, ?)",
+                [(namespace, key, json.dumps(value)) for key, value in mapping.items()],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def incr(self, namespace: str, key: str, amount: int = 1) -> int:
+        row = self._connection().execute(
+            "INSERT INTO state (namespace, key, value) VALUES (?, ?, ?)"
+            " ON CONFLICT (namespace, key) DO UPDATE SET value = CAST(value AS INTEGER) + ?"
+            " RETURNING value",
+            (namespace, key, str(amount), amount),
+        ).fetchone()
+        return int(row[0])
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        lease = json.dumps({"owner": owner, "expires": now + ttl})
+        row = self._connection().execute(
+            "INSERT INTO state (namespace, key, value) VALUES ('_leases', ?, ?)"
+            " ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value"
+            " WHERE json_extract(value, '$.owner') = ? OR json_extract(value, '$.expires') < ?"
+            " RETURNING value",
+            (name, lease, owner, now),
+        ).fetchone()
+        return row is not None
+
+
+def create_store(backend: Optional[str] = None, path: Optional[str] = None) -> StateStore:
+    """Build the store named by ``STATE_BACKEND`` ("memory" or "sqlite")."""
+    backend = (backend or os.getenv("STATE_BACKEND", "memory")).lower()
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "sqlite":
+        return SQLiteStateStore(path or os.getenv("STATE_DB_PATH", "careinbox_state.db"))
+    raise ValueError(f"Unknown STATE_BACKEND {backend!r}; expected 'memory' or 'sqlite'")
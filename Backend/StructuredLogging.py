@@ -0,0 +1,129 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from threading import Lock
+from typing import Any, Dict, Optional
+
+ROOT_LOGGER_NAME = "careinbox"
+
+# Comment: fields that may carry patient content (PHI); their values never reach the log sink
+REDACTED_FIELDS = frozenset({
+    "body",
+    "content",
+    "date_of_birth",
+    "description",
+    "from_addr",
+    "message",
+    "patient_name",
+    "payload",
+    "prompt",
+    "reason",
+    "reply",
+    "subject",
+    "summary",
+    "text",
+    "title",
+})
+
+REDACT = os.getenv("LOG_REDACT", "1") != "0"
+# Comment: fraction of sampled debug events that are kept (e.g. per-slot tracing)
+DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+
+_listener: Optional[QueueListener] = None
+_configure_lock = Lock()
+
+
+def redact(value: Any) -> str:
+    """Replace patient content with a marker that still shows its size."""
+    return f"[redacted len={len(value) if hasattr(value, '__len__') else 1}]"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; runs on the listener thread, off the request path."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            entry[key] = redact(value) if REDACT and key in REDACTED_FIELDS and value else value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """Hand records to the writer thread with their fields and traceback intact.
+
+    The stock ``prepare`` formats the message on the calling thread, folds the
+    traceback into ``msg`` and drops ``exc_info``, so the JSON line would lose its
+    ``exc`` field. Only the traceback text is rendered here (tracebacks can't be pickled
+    or outlive their frames); everything else is formatted by ``JsonFormatter``.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+        record.exc_info = None
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        return record
+
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """Route every ``careinbox.*`` logger through a queue to a background writer."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+        root.propagate = False
+
+        queue: SimpleQueue = SimpleQueue()
+        sink = logging.StreamHandler(sys.stderr)
+        sink.setFormatter(JsonFormatter())
+        root.addHandler(StructuredQueueHandler(queue))
+        _listener = QueueListener(queue, sink, respect_handler_level=False)
+        _listener.start()
+        # Comment: flush whatever is still queued when the process exits
+        atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def log_event(
+    logger: logging.Logger,
+    level: int,
+    event: str,
+    *,
+    sample_rate: float = 1.0,
+    exc_info: bool = False,
+    **fields: Any,
+) -> None:
+    """Emit ``event`` with structured ``fields``; disabled levels cost one int comparison."""
+    if not logger.isEnabledFor(level):
+        return
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
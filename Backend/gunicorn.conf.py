@@ -0,0 +1,23 @@
+# Production serving: one process per core, all sharing state through SQLite.
+#
+#     uv pip install ".[serve]"
+#     gunicorn -c gunicorn.conf.py
+import multiprocessing
+import os
+
+# Comment: module-level globals are per process, so multi-worker serving requires the shared backend
+os.environ.setdefault("STATE_BACKEND", "sqlite")
+os.environ.setdefault("STATE_DB_PATH", "careinbox_state.db")
+# Comment: workers would each try to open the same ngrok tunnel; front the port with one tunnel or proxy instead
+os.environ.setdefault("USE_NGROK", "0")
+
+wsgi_app = "main:create_app()"
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Comment: requests only enqueue work, so a few threads per worker keep ingress responsive
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "4"))
+# Comment: importing main is cheap, so each worker builds its own app (and warm-up) after fork
+preload_app = False
+timeout = 60
+graceful_timeout = 30
@@ -1,23 +1,57 @@
 import os
 import asyncio
 import json
-from threading import Thread
+import logging
+import re
+import socket
+import time
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from queue import Full, Queue
+from threading import Lock, RLock, Thread
 from datetime import datetime, timedelta, timezone
-from itertools import count
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Tuple
 
 import ngrok
-from flask import Flask, request, Response
+from flask import Blueprint, Flask, request, Response
 
 # Comment: wire up Google Calendar integration so the agent books real events
 from zoneinfo import ZoneInfo
 
 # Comment: reuse our calendar helper for real calendar operations
 from CreateCalendar import CalendarAPI
+from Dashboard import DashboardAggregates
+from FlightRecorder import create_recorder
+from Metrics import (
+    AVAILABILITY_TOTAL,
+    FAST_PATH_TOTAL,
+    MESSAGES_TOTAL,
+    QUEUE_DEPTH,
+    REGISTRY,
+    RUNS_IN_FLIGHT,
+    TOKENS_TOTAL,
+    TOOL_SECONDS,
+    SharedMetrics,
+    collect_stage_timings,
+    span,
+)
+from Polling import MessagePoller
+from SlotChoice import match_offered_slot, render_confirmation
+from SlotKeys import CLINIC_TIMEZONE, SlotParseError, from_key, key_to_iso, parse_instant, parse_slot, to_key
+from PromptBuilder import clean_body
+from StateStore import StateStore, create_store
+from StructuredLogging import DEBUG_SAMPLE_RATE, get_logger, log_event
 
 from agentmail import AgentMail
+
+try:
+    # Comment: orjson parses webhook bodies several times faster; fall back to the stdlib if absent
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 from agentmail_toolkit.openai import AgentMailToolkit
-from agents import Agent, Runner  # openai-agents
+from agents import Agent, RunHooks, Runner  # openai-agents
 from agents.tool import function_tool  # openai-agents
 
 
@@ -27,45 +61,153 @@ from agents.tool import function_tool  # openai-agents
 PORT = int(os.getenv("PORT", "8080"))
 DOMAIN = os.getenv("WEBHOOK_DOMAIN")  # optional; can be None
 INBOX = f"{os.getenv('INBOX_USERNAME')}@agentmail.to"
+# Comment: "webhook" receives pushes through ngrok; "poll" pulls from AgentMail and needs no tunnel
+INGESTION_MODE = os.getenv("INGESTION_MODE", "webhook").lower()
+# Comment: set USE_NGROK=0 when webhooks reach us through our own domain or reverse proxy
+USE_NGROK = INGESTION_MODE == "webhook" and os.getenv("USE_NGROK", "1") != "0"
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "1"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "30"))
+POLL_BATCH_SIZE = int(os.getenv("POLL_BATCH_SIZE", "50"))
+PROCESSING_WORKERS = int(os.getenv("PROCESSING_WORKERS", "4"))
+PROCESSING_QUEUE_SIZE = int(os.getenv("PROCESSING_QUEUE_SIZE", "1000"))
+# Comment: AgentMail payloads are a few KB; anything far larger is rejected before parsing
+MAX_WEBHOOK_BYTES = int(os.getenv("MAX_WEBHOOK_BYTES", str(512 * 1024)))
+# Comment: seconds a sender should wait before retrying when we shed load
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))
+# Comment: longest email body (after stripping quotes and signatures) forwarded to the model
+MAX_PROMPT_BODY_CHARS = int(os.getenv("MAX_PROMPT_BODY_CHARS", "4000"))
+# Comment: availability younger than this is reused instead of re-fetching Google Calendar
+AVAILABILITY_TTL_SECONDS = float(os.getenv("AVAILABILITY_TTL_SECONDS", "30"))
+# Comment: the only AgentMail tools exposed to the agent; each extra tool schema costs input tokens every turn
+AGENT_MAIL_TOOLS = [name for name in os.getenv("AGENT_MAIL_TOOLS", "reply_to_message").split(",") if name]
+# Comment: offered slots older than this are no longer booked from a bare reply; the agent re-offers instead
+SCHEDULING_STATE_TTL_SECONDS = float(os.getenv("SCHEDULING_STATE_TTL_SECONDS", str(24 * 3600)))
+# Comment: a poller that stops renewing its lease for this long is replaced by a standby worker
+POLL_LEASE_TTL = float(os.getenv("POLL_LEASE_TTL", str(POLL_MAX_INTERVAL * 3)))
+
+# Comment: routes live on a blueprint so importing this module never builds the app or touches the network
+routes = Blueprint("careinbox", __name__)
+log = get_logger("main")
+
+
+# --------------------------
+# Lazy dependencies + readiness
+# --------------------------
+# Comment: every external dependency is created on first use (or by the warm-up thread)
+_INIT_LOCK = RLock()
+_listener: Optional[Any] = None
+_client: Optional[AgentMail] = None
+_agent: Optional[Agent] = None
+
+# Comment: dependency name -> {"ready": bool, "error": str | None}
+READINESS: Dict[str, Dict[str, Any]] = {}
+
+
+def required_dependencies() -> List[str]:
+    """Comment: the tunnel only matters when we open it ourselves for webhooks."""
+    dependencies = ["agentmail", "agent", "calendar"]
+    if USE_NGROK:
+        dependencies.append("tunnel")
+    return dependencies
+
+
+def mark_ready(name: str, error: Optional[str] = None) -> None:
+    READINESS[name] = {"ready": error is None, "error": error}
+
 
-# Expose a public URL for webhooks (optional if you're deploying behind your own domain)
-listener = ngrok.forward(PORT, domain=DOMAIN, authtoken_from_env=True)
-app = Flask(__name__)
+def get_listener() -> Any:
+    """Comment: open the ngrok tunnel on first use so imports stay offline."""
+    global _listener
+    if _listener is None:
+        with _INIT_LOCK:
+            if _listener is None:
+                # Expose a public URL for webhooks (optional if you're deploying behind your own domain)
+                _listener = ngrok.forward(PORT, domain=DOMAIN, authtoken_from_env=True)
+                mark_ready("tunnel")
+    return _listener
 
-client = AgentMail()  # API key read from env: AGENTMAIL_API_KEY
+
+def get_client() -> AgentMail:
+    global _client
+    if _client is None:
+        with _INIT_LOCK:
+            if _client is None:
+                _client = AgentMail()  # API key read from env: AGENTMAIL_API_KEY
+                mark_ready("agentmail")
+    return _client
 
 
 # --------------------------
-# Deduping + Thread Memory
+# Shared state
 # --------------------------
-# Some providers retry webhooks; also your app may restart and race.
-# We maintain small in-memory sets to avoid double-processing.
-PROCESSED_EVENT_IDS: Set[str] = set()
-PROCESSED_MESSAGE_IDS: Set[str] = set()
+# Comment: all mutable state lives in a StateStore so several worker processes can share it.
+# STATE_BACKEND=memory (default) keeps it in-process; STATE_BACKEND=sqlite shares one file per host.
+STATE: StateStore = create_store()
+# Comment: incrementally maintained counters behind /dashboard
+DASHBOARD = DashboardAggregates(STATE)
+# Comment: /metrics sums every worker's registry through the store, whichever worker answers
+METRICS = SharedMetrics(REGISTRY, STATE, interval=float(os.getenv("METRICS_PUBLISH_INTERVAL", "5")))
 
+# Some providers retry webhooks; also your app may restart and race.
+# We claim ids in bounded namespaces to avoid double-processing.
+PROCESSED_EVENTS_NS = "processed_event_ids"
+PROCESSED_MESSAGES_NS = "processed_message_ids"
+PROCESSED_IDS_LIMIT = 5000
 # Keep per-thread chat histories (list of dict[{role, content}])
-THREAD_MESSAGES: Dict[str, List[Dict[str, str]]] = {}
-
+THREAD_MESSAGES_NS = "thread_messages"
 # Capture emergency-flagged agent outputs for later human handling
-FLAGGED_RESPONSES: Dict[str, Dict[str, Any]] = {}
-
+FLAGGED_RESPONSES_NS = "flagged_responses"
 # Comment: track emergency state that external clients can query and reset
-EMERGENCY_STATE = {
+EMERGENCY_NS = "emergency"
+# Comment: maintain shared availability so the agent can do true scheduling (str(slot key) -> True)
+# Slot keys are integer epoch minutes (see SlotKeys), so membership and range checks are integer work
+AVAILABLE_SLOTS_NS = "available_slots"
+# Comment: slots taken by a booking (str(slot key) -> unix time its calendar event was created, None
+# while creating it); a refresh whose listing started before that may still show the slot as free
+RESERVED_SLOTS_NS = "reserved_slots"
+# Comment: track booked appointments for auditing and potential future use
+BOOKED_APPOINTMENTS_NS = "booked_appointments"
+# Comment: provide monotonically increasing confirmation IDs
+COUNTERS_NS = "counters"
+# Comment: when availability was last refreshed (shared so workers reuse each other's fetches)
+AVAILABILITY_META_NS = "availability_meta"
+# Comment: threads where schedule_appointment has run (thread_id -> unix time)
+SCHEDULING_THREADS_NS = "scheduling_threads"
+# Comment: per-thread scheduling conversation (thread_id -> slots last offered, patient, reason)
+SCHEDULING_STATE_NS = "scheduling_state"
+
+# Comment: where polling ingestion has read up to ({"at": iso timestamp, "seen": ids at that instant})
+POLLER_NS = "poller"
+
+# Comment: thread being processed, so tools can attribute their work to it
+CURRENT_THREAD_ID: ContextVar[str] = ContextVar("current_thread_id", default="")
+CURRENT_MESSAGE_ID: ContextVar[str] = ContextVar("current_message_id", default="")
+
+# Comment: opt-in flight recorder (FLIGHT_RECORDER_DIR); None keeps process_webhook free of recording work
+RECORDER = create_recorder()
+# Comment: the recording for the message being processed, filled in as the pipeline runs
+CURRENT_FLIGHT: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_flight", default=None)
+
+EMPTY_EMERGENCY_STATE = {
     "active": False,
     "timestamp": None,
     "last_thread_id": None,
     "message": None
 }
 
-# Comment: maintain in-memory availability so the agent can do true scheduling
-AVAILABLE_SLOTS: Set[str] = set()
-# Comment: track booked appointments for auditing and potential future use
-BOOKED_APPOINTMENTS: Dict[str, Dict[str, Any]] = {}
-# Comment: provide monotonically increasing confirmation IDs
-_SLOT_ID_COUNTER = count(1)
+
+def get_emergency_state() -> Dict[str, Any]:
+    return STATE.get(EMERGENCY_NS, "state", EMPTY_EMERGENCY_STATE)
+
+
+def set_emergency_state(state: Dict[str, Any]) -> None:
+    STATE.set(EMERGENCY_NS, "state", state)
+
+
 # Comment: hardcode everything to UTC-4 timezone and fixed date
 CLINIC_TIMEZONE_NAME = "UTC-4"
-CLINIC_TIMEZONE = timezone(timedelta(hours=-4))
+# Comment: every appointment is one 30-minute block
+SLOT_MINUTES = 30
 # Comment: hardcoded current date for consistent testing - set to 10 AM
 FIXED_DATE = datetime(2025, 9, 28, 10, 0, 0, tzinfo=CLINIC_TIMEZONE)
 # Comment: lazily initialize calendar API so OAuth prompts only occur when needed
@@ -81,13 +223,20 @@ def get_calendar_api() -> CalendarAPI:
     """Comment: instantiate or reuse the Google Calendar client."""
     global _calendar_api
     if _calendar_api is None:
-        _calendar_api = CalendarAPI()
+        with _INIT_LOCK:
+            if _calendar_api is None:
+                _calendar_api = CalendarAPI()
     return _calendar_api
 
 
 def seed_available_slots(days: int = 7) -> None:
-    """Comment: populate AVAILABLE_SLOTS using live calendar availability."""
-    AVAILABLE_SLOTS.clear()
+    """Comment: populate the shared availability using live calendar availability."""
+    with span("seed_available_slots"):
+        _seed_available_slots(days)
+
+
+def _seed_available_slots(days: int) -> None:
+    available: Dict[str, bool] = {}
 
     # Comment: get hardcoded current time in UTC-4
     now_local = get_current_time()
@@ -95,10 +244,11 @@ def seed_available_slots(days: int = 7) -> None:
 
     # Comment: fetch existing events so we avoid double-booking
     calendar = get_calendar_api()
+    listing_started = time.time()
     existing = calendar.list_events(200) or []
 
-    # Comment: capture busy intervals in UTC for overlap checks
-    busy_intervals: List[tuple[datetime, datetime]] = []
+    # Comment: capture busy intervals as [start, end) slot keys for integer overlap checks
+    busy_intervals: List[tuple[int, int]] = []
     for event in existing:
         start_info = event.get("start") or {}
         end_info = event.get("end") or {}
@@ -107,114 +257,169 @@ def seed_available_slots(days: int = 7) -> None:
         if not start_str or not end_str:
             # Comment: skip all-day or malformed events for now
             continue
-        try:
-            start_dt = datetime.fromisoformat(start_str.replace("Z", "+00:00")).astimezone(timezone.utc)
-            end_dt = datetime.fromisoformat(end_str.replace("Z", "+00:00")).astimezone(timezone.utc)
-        except ValueError:
+        busy_start, busy_end = parse_instant(start_str), parse_instant(end_str)
+        if busy_start is None or busy_end is None:
             continue
-        busy_intervals.append((start_dt, end_dt))
+        busy_intervals.append((busy_start, busy_end))
+    busy_intervals.sort()
+    # Comment: merge overlapping events so the disjoint intervals can be swept alongside the slots
+    merged: List[tuple[int, int]] = []
+    for busy_start, busy_end in busy_intervals:
+        if merged and busy_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], busy_end))
+        else:
+            merged.append((busy_start, busy_end))
 
+    start_key = to_key(start_local)
+    # Comment: slots are visited in increasing order, so the sweep position never moves back
+    busy_index = 0
     for day_offset in range(days):
         day_start_local = (start_local + timedelta(days=day_offset)).replace(
             hour=9, minute=0, second=0, microsecond=0
         )
+        day_start_key = to_key(day_start_local)
         for slot_index in range(16):
-            slot_local = day_start_local + timedelta(minutes=30 * slot_index)
-            if slot_local < start_local:
+            slot_key = day_start_key + SLOT_MINUTES * slot_index
+            if slot_key < start_key:
                 continue
-            slot_start_utc = slot_local.astimezone(timezone.utc)
-            slot_end_utc = slot_start_utc + timedelta(minutes=30)
+            slot_end_key = slot_key + SLOT_MINUTES
+            while busy_index < len(merged) and merged[busy_index][1] <= slot_key:
+                busy_index += 1
             # Comment: skip if this 30-minute block overlaps an existing event
-            overlaps = any(
-                slot_start_utc < busy_end and slot_end_utc > busy_start
-                for busy_start, busy_end in busy_intervals
-            )
-            if overlaps:
+            if busy_index < len(merged) and merged[busy_index][0] < slot_end_key:
                 continue
-            # Comment: store slots in UTC-4 format for consistency
-            slot_start_local_iso = slot_local.isoformat(timespec="minutes")
-            AVAILABLE_SLOTS.add(slot_start_local_iso)
-            print(f"[DEBUG] Added available slot: {slot_start_local_iso}")
+            available[str(slot_key)] = True
+
+    # Comment: publish the new availability in one step so readers never see a half-built set
+    STATE.replace(AVAILABLE_SLOTS_NS, available)
+    # Comment: subtract bookings the listing may have missed; reading the reservations after the
+    # replace means a booking that lands in between is still seen here. Reservations whose event
+    # existed before the listing started are reflected in it, so they are dropped instead.
+    for reserved, created_at in STATE.items(RESERVED_SLOTS_NS).items():
+        if created_at is not None and created_at < listing_started:
+            STATE.pop(RESERVED_SLOTS_NS, reserved)
+        else:
+            STATE.pop(AVAILABLE_SLOTS_NS, reserved)
+    STATE.set(AVAILABILITY_META_NS, "refreshed_at", time.time())
+    mark_ready("calendar")
+    log_event(log, logging.DEBUG, "slots_seeded", count=len(available), busy=len(busy_intervals))
 
 
-seed_available_slots()
+# --------------------------
+# Availability prefetch
+# --------------------------
+# Comment: single-flight refresh per process; the tool waits on an in-flight prefetch instead of fetching again
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="availability")
+_REFRESH_LOCK = Lock()
+_refresh_future: Optional[Future] = None
+
+_SCHEDULING_HINTS = re.compile(
+    r"\b(appointment|appt|schedul\w*|reschedul\w*|book\w*|availab\w*|slot|opening|"
+    r"cancel\w*|visit|tomorrow|today|next week|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|"
+    r"\d{1,2}(:\d{2})?\s*(am|pm)|\d{1,2}:\d{2})\b",
+    re.IGNORECASE,
+)
 
 
-def _normalize_slot(slot: str) -> Optional[str]:
-    """Coerce arbitrary slot strings into the canonical ISO format we store."""
-    if not slot:
-        return None
+def availability_is_fresh() -> bool:
+    refreshed_at = STATE.get(AVAILABILITY_META_NS, "refreshed_at", 0)
+    return time.time() - refreshed_at < AVAILABILITY_TTL_SECONDS
 
-    candidate = slot.strip()
-    if not candidate:
-        return None
 
-    try:
-        # Comment: handle various timezone formats
-        if candidate.endswith("Z"):
-            parsed = datetime.fromisoformat(candidate.replace("Z", "+00:00"))
-        elif "+" in candidate or candidate.count("-") > 2:
-            parsed = datetime.fromisoformat(candidate)
-        else:
-            # Comment: assume naive inputs are in UTC-4
-            parsed = datetime.fromisoformat(candidate).replace(tzinfo=CLINIC_TIMEZONE)
-    except ValueError:
-        # Comment: if parsing fails, surface the raw string for visibility but fail matching
-        return slot.strip()
-
-    normalized = parsed.replace(second=0, microsecond=0)
-    if normalized.tzinfo is None:
-        # Comment: assume naive inputs are given in the clinic's local timezone
-        normalized = normalized.replace(tzinfo=CLINIC_TIMEZONE)
-    
-    # Comment: if time is midnight (00:00), default to 9 AM clinic opening time
-    if normalized.hour == 0 and normalized.minute == 0:
-        normalized = normalized.replace(hour=9)
-    
-    # Comment: convert to UTC-4 and return in ISO format
-    return normalized.astimezone(CLINIC_TIMEZONE).isoformat(timespec="minutes")
+def refresh_availability_async(force: bool = False) -> Future:
+    """Comment: start a background refresh, or join the one already running unless ``force`` is set.
+
+    ``force`` is for callers that just changed the calendar: a fetch already in flight
+    started before the change and would publish a stale view.
+    """
+    global _refresh_future
+    with _REFRESH_LOCK:
+        if force or _refresh_future is None or _refresh_future.done():
+            _refresh_future = _PREFETCH_POOL.submit(seed_available_slots)
+        return _refresh_future
+
+
+def ensure_fresh_availability() -> None:
+    """Comment: make shared availability current, reusing a prefetch or a recent refresh when possible."""
+    future = _refresh_future
+    if future is not None and not future.done():
+        AVAILABILITY_TOTAL.inc(result="waited")
+        try:
+            future.result()
+            return
+        except Exception as e:
+            log_event(log, logging.WARNING, "availability_prefetch_failed", error=str(e))
+    elif availability_is_fresh():
+        AVAILABILITY_TOTAL.inc(result="fresh")
+        return
+    AVAILABILITY_TOTAL.inc(result="fetched")
+    seed_available_slots()
+
+
+def is_likely_scheduling(thread_id: str, email: Dict[str, Any]) -> bool:
+    """Comment: cheap intent guess — the thread is already scheduling, or the email mentions times or booking."""
+    if thread_id and STATE.contains(SCHEDULING_THREADS_NS, thread_id):
+        return True
+    text = f"{email.get('subject') or ''}\n{email.get('extracted_text') or email.get('text') or ''}"
+    return bool(_SCHEDULING_HINTS.search(text))
+
+
+def prefetch_availability(thread_id: str, email: Dict[str, Any]) -> None:
+    """Comment: warm availability alongside the LLM call so the tool finds it in memory."""
+    if availability_is_fresh() or not is_likely_scheduling(thread_id, email):
+        return
+    AVAILABILITY_TOTAL.inc(result="prefetch_started")
+    refresh_availability_async()
+
+
+def _available_slot_keys() -> List[int]:
+    return sorted(int(key) for key in STATE.keys(AVAILABLE_SLOTS_NS))
 
 
 def _suggest_alternatives(limit: int = 5) -> List[str]:
     """Return the next few available slots in chronological order."""
-    return sorted(AVAILABLE_SLOTS)[:limit]
+    return [key_to_iso(key) for key in _available_slot_keys()[:limit]]
 
 
-def _reserve_slot(slot: str, patient_name: str, reason: str) -> Dict[str, Any]:
+def _reserve_slot(slot_key: int, patient_name: str, reason: str) -> Dict[str, Any]:
     """Reserve the given slot and record the appointment."""
-    AVAILABLE_SLOTS.discard(slot)
-    confirmation_id = f"CONF-{next(_SLOT_ID_COUNTER):04d}"
-
-    # Comment: parse slot time (already in UTC-4 format)
-    slot_start_local = datetime.fromisoformat(slot)
-    slot_end_local = slot_start_local + timedelta(minutes=30)
+    # Comment: the reservation claim is atomic across workers, so only one booking can win a slot,
+    # even if a stale refresh has just put it back into availability
+    if not STATE.claim(RESERVED_SLOTS_NS, str(slot_key), None):
+        raise RuntimeError(f"Slot {key_to_iso(slot_key)} was just taken")
+    if not STATE.pop(AVAILABLE_SLOTS_NS, str(slot_key), False):
+        STATE.pop(RESERVED_SLOTS_NS, str(slot_key))
+        raise RuntimeError(f"Slot {key_to_iso(slot_key)} was just taken")
+    confirmation_id = f"CONF-{STATE.incr(COUNTERS_NS, 'confirmation_id'):04d}"
 
-    # Comment: convert to UTC for Google Calendar to avoid timezone confusion
-    slot_start_utc = slot_start_local.astimezone(timezone.utc)
-    slot_end_utc = slot_end_local.astimezone(timezone.utc)
-    
     # Comment: create naive UTC datetime objects for Google Calendar
-    slot_start_naive = slot_start_utc.replace(tzinfo=None)
-    slot_end_naive = slot_end_utc.replace(tzinfo=None)
+    slot_start_naive = from_key(slot_key, timezone.utc).replace(tzinfo=None)
+    slot_end_naive = from_key(slot_key + SLOT_MINUTES, timezone.utc).replace(tzinfo=None)
 
     # Comment: create the calendar event so the appointment exists in Google Calendar
     calendar = get_calendar_api()
-    event_id = calendar.add_event(
-        title=f"Appointment with {patient_name}",
-        description=f"Reason: {reason}",
-        start_dt=slot_start_naive,
-        end_dt=slot_end_naive,
-        tz="UTC",  # Comment: Use UTC to avoid timezone conversion issues
-    )
+    with span("calendar_add_event"):
+        event_id = calendar.add_event(
+            title=f"Appointment with {patient_name}",
+            description=f"Reason: {reason}",
+            start_dt=slot_start_naive,
+            end_dt=slot_end_naive,
+            tz="UTC",  # Comment: Use UTC to avoid timezone conversion issues
+        )
 
     if not event_id:
-        # Comment: if calendar creation failed, reinsert slot and surface the issue
-        AVAILABLE_SLOTS.add(slot)
+        # Comment: if calendar creation failed, release the reservation, reinsert slot and surface the issue
+        STATE.pop(RESERVED_SLOTS_NS, str(slot_key))
+        STATE.set(AVAILABLE_SLOTS_NS, str(slot_key), True)
         raise RuntimeError("Failed to create calendar event")
 
+    # Comment: listings that start from now on include the event, so they may let the reservation go
+    STATE.set(RESERVED_SLOTS_NS, str(slot_key), time.time())
+
     appointment = {
         "confirmation_id": confirmation_id,
-        "slot": slot,
+        "slot": key_to_iso(slot_key),
         "patient": patient_name,
         "reason": reason,
         "location": "MHacks Clinic",
@@ -223,26 +428,33 @@ def _reserve_slot(slot: str, patient_name: str, reason: str) -> Dict[str, Any]:
         "created_at": get_current_time().isoformat(timespec="seconds"),
         "calendar_event_id": event_id,
     }
-    BOOKED_APPOINTMENTS[confirmation_id] = appointment
+    STATE.set(BOOKED_APPOINTMENTS_NS, confirmation_id, appointment)
+    DASHBOARD.record_booking(appointment["slot"][:10])
 
-    # Comment: refresh availability so the agent reflects the latest calendar state
-    seed_available_slots()
+    # Comment: refresh availability in the background so the booking reply is not held up by Calendar;
+    # always a new fetch, since one already in flight was listed before this event existed
+    refresh_availability_async(force=True)
     return appointment
 
 
 def is_already_processed(event_id: str, message_id: str) -> bool:
-    if event_id in PROCESSED_EVENT_IDS or message_id in PROCESSED_MESSAGE_IDS:
+    # Comment: claims are atomic, so a retry racing in another worker is deduped too;
+    # the namespaces stay bounded by evicting the oldest ids
+    if event_id and not STATE.claim(PROCESSED_EVENTS_NS, event_id, max_items=PROCESSED_IDS_LIMIT):
+        return True
+    if message_id and not STATE.claim(PROCESSED_MESSAGES_NS, message_id, max_items=PROCESSED_IDS_LIMIT):
         return True
-    PROCESSED_EVENT_IDS.add(event_id)
-    PROCESSED_MESSAGE_IDS.add(message_id)
-    # Keep the sets bounded (very naive LRU-ish trim)
-    if len(PROCESSED_EVENT_IDS) > 5000:
-        PROCESSED_EVENT_IDS.clear()
-    if len(PROCESSED_MESSAGE_IDS) > 5000:
-        PROCESSED_MESSAGE_IDS.clear()
     return False
 
 
+def release_processed(event_id: str, message_id: str) -> None:
+    """Comment: forget claims for a payload we could not accept, so its retry is processed."""
+    if event_id:
+        STATE.pop(PROCESSED_EVENTS_NS, event_id)
+    if message_id:
+        STATE.pop(PROCESSED_MESSAGES_NS, message_id)
+
+
 # --------------------------
 # Tool: ScheduleAppointment (stub)
 # --------------------------
@@ -252,41 +464,73 @@ async def schedule_appointment(
     reason: str,
     preferred_slots: Optional[List[str]] = None,
     confirmed: bool = False,
+    date_of_birth: str = "",
 ) -> Dict[str, Any]:
     """
     Comment: Core scheduling logic — checks availability, reserves slots, or proposes options.
     Comment: The agent interprets the returned status to decide whether to confirm or keep chatting.
     """
-    ts = get_current_time().isoformat(timespec="seconds")
-    print("\n[TOOL CALL] schedule_appointment")
-    print(f"  time: {ts}")
-    print(f"  patient_name: {patient_name!r}")
-    print(f"  reason: {reason!r}")
-    print(f"  preferred_slots: {preferred_slots or []}")
-    print(f"  confirmed: {confirmed}\n")
-
-    # Comment: refresh availability from Google Calendar at the start of each request
-    seed_available_slots()
+    log_event(
+        log,
+        logging.INFO,
+        "tool_call",
+        tool="schedule_appointment",
+        patient_name=patient_name,
+        reason=reason,
+        preferred_slots=preferred_slots or [],
+        confirmed=confirmed,
+        date_of_birth=date_of_birth,
+    )
+
+    thread_id = CURRENT_THREAD_ID.get()
+    if thread_id:
+        STATE.claim(SCHEDULING_THREADS_NS, thread_id, time.time(), max_items=PROCESSED_IDS_LIMIT)
+    result = _schedule_appointment(patient_name, reason, preferred_slots, confirmed)
+    if thread_id:
+        remember_scheduling_state(thread_id, patient_name, reason, result, date_of_birth)
+    return result
 
-    normalized_slots: List[str] = []
-    unavailable_slots: List[str] = []
-    invalid_inputs: List[str] = []
 
-    # Comment: normalize and classify the requested slots, if any were supplied
+def _schedule_appointment(
+    patient_name: str,
+    reason: str,
+    preferred_slots: Optional[List[str]],
+    confirmed: bool,
+) -> Dict[str, Any]:
+    # Comment: make sure availability is current; usually a prefetch already did the Calendar round trip
+    ensure_fresh_availability()
+
+    requested_keys: List[int] = []
+    unavailable_keys: List[int] = []
+    invalid_inputs: List[Dict[str, str]] = []
+    now_key = to_key(get_current_time())
+
+    # Comment: parse and classify the requested slots, if any were supplied
     for raw_slot in preferred_slots or []:
-        print(f"[DEBUG] Processing raw slot: {raw_slot}")
-        normalized = _normalize_slot(raw_slot)
-        print(f"[DEBUG] Normalized to: {normalized}")
-        if not normalized:
-            invalid_inputs.append(raw_slot)
+        try:
+            slot_key = parse_slot(raw_slot)
+        except SlotParseError as exc:
+            invalid_inputs.append(exc.to_dict())
             continue
-        if normalized in AVAILABLE_SLOTS:
-            print(f"[DEBUG] Slot {normalized} is AVAILABLE")
-            normalized_slots.append(normalized)
+        if slot_key < now_key:
+            invalid_inputs.append({"input": raw_slot, "error": "slot is in the past"})
+            continue
+        available = STATE.contains(AVAILABLE_SLOTS_NS, str(slot_key))
+        log_event(
+            log,
+            logging.DEBUG,
+            "slot_checked",
+            sample_rate=DEBUG_SAMPLE_RATE,
+            raw_slot=raw_slot,
+            slot_key=slot_key,
+            available=available,
+        )
+        if available:
+            requested_keys.append(slot_key)
         else:
-            print(f"[DEBUG] Slot {normalized} is NOT AVAILABLE")
-            print(f"[DEBUG] Available slots: {sorted(list(AVAILABLE_SLOTS))[:5]}")
-            unavailable_slots.append(normalized)
+            unavailable_keys.append(slot_key)
+    normalized_slots = [key_to_iso(key) for key in requested_keys]
+    unavailable_slots = [key_to_iso(key) for key in unavailable_keys]
 
     if confirmed and not normalized_slots:
         # Comment: patient tried to confirm an unavailable slot; prompt for new options
@@ -301,11 +545,11 @@ async def schedule_appointment(
 
     if normalized_slots and confirmed:
         # Comment: reserve the earliest viable slot and hand details back to the agent
-        chosen_slot = sorted(normalized_slots)[0]
+        chosen_key = min(requested_keys)
         try:
-            appointment = _reserve_slot(chosen_slot, patient_name, reason)
+            appointment = _reserve_slot(chosen_key, patient_name, reason)
         except Exception as exc:
-            print(f"[ERROR] Failed to reserve slot {chosen_slot}: {exc}")
+            log_event(log, logging.ERROR, "slot_reserve_failed", slot=key_to_iso(chosen_key), error=str(exc))
             alternatives = _suggest_alternatives()
             return {
                 "status": "error",
@@ -342,22 +586,104 @@ async def schedule_appointment(
     }
 
 
+# --------------------------
+# Scheduling fast path
+# --------------------------
+def remember_scheduling_state(
+    thread_id: str,
+    patient_name: str,
+    reason: str,
+    result: Dict[str, Any],
+    date_of_birth: str = "",
+) -> None:
+    """Comment: keep what the patient was last offered so a bare pick can be booked without the agent."""
+    if result.get("status") == "booked":
+        STATE.pop(SCHEDULING_STATE_NS, thread_id)
+        DASHBOARD.clear_awaiting_patient(thread_id)
+        return
+    if result.get("status") == "awaiting_patient":
+        DASHBOARD.record_awaiting_patient(thread_id)
+    # Comment: available times the patient proposed are what the agent asks them to confirm
+    offered = result.get("requested_slots") if result.get("status") == "awaiting_patient" else None
+    offered = offered or result.get("alternatives") or []
+    if not offered:
+        return
+    STATE.set(SCHEDULING_STATE_NS, thread_id, {
+        "offered": [parse_slot(slot) for slot in offered],
+        "patient_name": patient_name,
+        "date_of_birth": date_of_birth,
+        "reason": reason,
+        "updated_at": time.time(),
+    })
+
+
+def try_scheduling_fast_path(thread_id: str, email: Dict[str, Any]) -> Optional[str]:
+    """Book the slot a reply clearly picks from the last offer and return the confirmation.
+
+    None means the message goes to the agent: no offer on record, an expired offer,
+    patient details still missing, an ambiguous or chatty reply, or the slot is no longer free.
+    """
+    state = STATE.get(SCHEDULING_STATE_NS, thread_id) if thread_id else None
+    if not state:
+        return None
+    if time.time() - state.get("updated_at", 0) > SCHEDULING_STATE_TTL_SECONDS:
+        STATE.pop(SCHEDULING_STATE_NS, thread_id)
+        FAST_PATH_TOTAL.inc(result="expired")
+        return None
+    # Comment: the agent still has to collect the legal (first and last) name and date of birth
+    if len((state.get("patient_name") or "").split()) < 2 or not state.get("date_of_birth"):
+        FAST_PATH_TOTAL.inc(result="missing_details")
+        return None
+    with span("fast_path"):
+        now_key = to_key(get_current_time())
+        offered = [key for key in state["offered"] if key >= now_key]
+        patient_name = state["patient_name"]
+        slot_key = match_offered_slot(clean_body(email, MAX_PROMPT_BODY_CHARS), offered, patient_name.split())
+        if slot_key is None:
+            FAST_PATH_TOTAL.inc(result="no_match")
+            return None
+        ensure_fresh_availability()
+        if not STATE.contains(AVAILABLE_SLOTS_NS, str(slot_key)):
+            # Comment: the agent explains and offers fresh alternatives
+            FAST_PATH_TOTAL.inc(result="unavailable")
+            return None
+        try:
+            appointment = _reserve_slot(slot_key, patient_name, state.get("reason", ""))
+        except Exception as e:
+            log_event(log, logging.WARNING, "fast_path_reserve_failed", thread_id=thread_id, error=str(e))
+            FAST_PATH_TOTAL.inc(result="error")
+            return None
+    STATE.pop(SCHEDULING_STATE_NS, thread_id)
+    FAST_PATH_TOTAL.inc(result="booked")
+    log_event(
+        log,
+        logging.INFO,
+        "fast_path_booked",
+        thread_id=thread_id,
+        slot=appointment["slot"],
+        confirmation_id=appointment["confirmation_id"],
+    )
+    return render_confirmation(appointment, slot_key)
+
+
 # --------------------------
 # Agent System Prompt
 # --------------------------
+# Comment: keep this prefix byte-identical across turns so provider-side prompt caching hits;
+# anything that changes per turn (like the current date) goes into the user message instead
 instructions = f"""
 You are an email triage and scheduling agent for a clinic. Your name is CareInbox.
 Your email address is {INBOX}.
 
 CURRENT DATE & TIME CONTEXT
-- Today's date is {get_current_time().strftime('%A, %B %d, %Y')} at {get_current_time().strftime('%I:%M %p')} (UTC-4)
+- Each incoming message starts with a "Current date" line giving today's date and time (UTC-4)
 - When patients mention dates, always check if they're requesting past dates and clarify if needed
 - If a patient requests a past date, politely explain it's not possible and offer current available dates
 
 GOALS
 1) Read incoming emails and classify intent: scheduling, routine question, admin request, or potential emergency.
 2) If emergency or severe red-flag symptoms (e.g., chest pain, stroke signs, suicidal ideation, severe breathing issues), DO NOT provide medical advice. Reply with a json object with the key emergency: true and message: a brief urgent-safety message for the human review.
-3) If scheduling is requested, gather any missing details (legal name, visit reason, availability) and call the schedule_appointment tool. Supply the patient's name, reason, and any concrete preferred times the patient provides. If the patient did not give any time, pass an empty list so the tool can propose available slots.
+3) If scheduling is requested, gather any missing details (legal name, visit reason, availability) and call the schedule_appointment tool. Supply the patient's legal name, date of birth (once given), reason, and any concrete preferred times the patient provides. If the patient did not give any time, pass an empty list so the tool can propose available slots.
 4) For routine/admin questions (refill status, hours, directions, paperwork), answer succinctly and politely.
 5) Keep all outputs as plain-text email bodies (no Subject). Never use markdown or placeholders.
 
@@ -383,22 +709,32 @@ IMPORTANT GUARDRAILS
 - Do not reply to your own sent messages.
 """
 
-agent = Agent(
-    name="Clinic Agent",
-    instructions=instructions,
-    tools=AgentMailToolkit(client).get_tools() + [schedule_appointment],
-)
+def get_agent() -> Agent:
+    """Comment: build the agent (and its AgentMail tools) on first use."""
+    global _agent
+    if _agent is None:
+        with _INIT_LOCK:
+            if _agent is None:
+                _agent = Agent(
+                    name="Clinic Agent",
+                    instructions=instructions,
+                    tools=AgentMailToolkit(get_client()).get_tools(AGENT_MAIL_TOOLS) + [schedule_appointment],
+                )
+                mark_ready("agent")
+    return _agent
 
 
 # --------------------------
 # Helpers
 # --------------------------
 def format_prompt_from_email(email: Dict[str, Any]) -> str:
-    """Turn an email object into a user message for the LLM."""
+    """Turn an email object into a user message for the LLM (new content only, no quoted history)."""
     from_addr = email.get("from") or email.get("from_", "")
     subject = email.get("subject", "(no subject)")
-    body = (email.get("text") or "").strip()
-    return f"From: {from_addr}\nSubject: {subject}\nBody:\n{body}\n"
+    body = clean_body(email, MAX_PROMPT_BODY_CHARS)
+    now = get_current_time()
+    current_date = f"{now.strftime('%A, %B %d, %Y')} at {now.strftime('%I:%M %p')} (UTC-4)"
+    return f"Current date: {current_date}\nFrom: {from_addr}\nSubject: {subject}\nBody:\n{body}\n"
 
 
 def should_reply_to(email: Dict[str, Any]) -> bool:
@@ -415,85 +751,356 @@ def should_reply_to(email: Dict[str, Any]) -> bool:
     return True
 
 
+def reply_latency_seconds(payload: Dict[str, Any]) -> Optional[float]:
+    """Comment: time since the patient sent the email, or since we accepted it if it has no timestamp."""
+    sent_at = (payload.get("message") or {}).get("timestamp")
+    if isinstance(sent_at, str):
+        try:
+            sent = datetime.fromisoformat(sent_at)
+        except ValueError:
+            sent = None
+        if sent is not None:
+            if sent.tzinfo is None:
+                sent = sent.replace(tzinfo=timezone.utc)
+            return max(time.time() - sent.timestamp(), 0.0)
+    received_at = payload.get("received_at")
+    return time.time() - received_at if received_at else None
+
+
 def get_thread_messages(thread_id: str) -> List[Dict[str, str]]:
-    """Fetch or create the per-thread memory list."""
-    if thread_id not in THREAD_MESSAGES:
-        THREAD_MESSAGES[thread_id] = []
-    return THREAD_MESSAGES[thread_id]
+    """Fetch the per-thread memory list (empty for a new thread)."""
+    return STATE.get(THREAD_MESSAGES_NS, thread_id, [])
 
 
-def persist_thread_messages(thread_id: str, response) -> None:
+def persist_thread_messages(thread_id: str, items: List[Dict[str, Any]]) -> None:
     """Update per-thread memory after a run."""
-    THREAD_MESSAGES[thread_id] = response.to_input_list()
+    STATE.set(THREAD_MESSAGES_NS, thread_id, items)
+
+
+class ToolTimingHooks(RunHooks):
+    """Comment: time every tool call the agent makes during a single run (and record it when a flight is open)."""
+
+    def __init__(self):
+        self._started: Dict[str, float] = {}
+
+    @staticmethod
+    def _call_key(context, tool) -> str:
+        # Comment: parallel calls to the same tool run concurrently, so pair start and end by call id
+        return getattr(context, "tool_call_id", None) or tool.name
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        self._started[self._call_key(context, tool)] = time.perf_counter()
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        started = self._started.pop(self._call_key(context, tool), None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        TOOL_SECONDS.observe(elapsed, tool=tool.name)
+        flight = CURRENT_FLIGHT.get()
+        if flight is not None:
+            # Comment: ToolContext carries the raw JSON arguments in recent openai-agents releases
+            arguments = getattr(context, "tool_arguments", None)
+            if isinstance(arguments, str):
+                try:
+                    arguments = json.loads(arguments)
+                except json.JSONDecodeError:
+                    pass
+            flight["tool_calls"].append({
+                "tool": tool.name,
+                "arguments": arguments,
+                "result": result,
+                "offset": round(started - flight["started"], 6),
+                "seconds": round(elapsed, 6),
+            })
+
+
+def run_agent(input_items: List[Dict[str, Any]]):
+    """Comment: run the agent with tool timing, in-flight tracking and token accounting."""
+    RUNS_IN_FLIGHT.inc()
+    try:
+        with span("agent_run"):
+            response = asyncio.run(Runner.run(get_agent(), input_items, hooks=ToolTimingHooks()))
+    finally:
+        RUNS_IN_FLIGHT.dec()
+    usage = getattr(response.context_wrapper, "usage", None)
+    if usage is not None:
+        TOKENS_TOTAL.inc(usage.input_tokens, kind="input")
+        TOKENS_TOTAL.inc(usage.output_tokens, kind="output")
+    return response
+
+
+# --------------------------
+# Health & readiness
+# --------------------------
+@routes.route("/healthz", methods=["GET"])
+def healthz():
+    """Comment: liveness only — the process is up and serving requests"""
+    return {"status": "ok"}
+
+
+@routes.route("/readyz", methods=["GET"])
+def readyz():
+    """Comment: ready once every required dependency has initialized"""
+    dependencies = {
+        name: READINESS.get(name, {"ready": False, "error": None}) for name in required_dependencies()
+    }
+    ready = all(status["ready"] for status in dependencies.values())
+    return {"ready": ready, "dependencies": dependencies}, 200 if ready else 503
+
+
+# --------------------------
+# Metrics
+# --------------------------
+@routes.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Comment: expose stage timings and counters for Prometheus scraping"""
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+
+# --------------------------
+# Dashboard
+# --------------------------
+@routes.route("/dashboard", methods=["GET"])
+def get_dashboard():
+    """Comment: serve the precomputed snapshot; unchanged data answers 304 to If-None-Match"""
+    etag, body = DASHBOARD.snapshot(datetime.now(timezone.utc).isoformat(timespec="seconds"))
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    # Comment: let browsers keep the copy but always revalidate, which is a cheap 304 when nothing moved
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
 
 # --------------------------
 # Emergency State API Endpoints
 # --------------------------
-@app.route("/emergency/status", methods=["GET"])
+@routes.route("/emergency/status", methods=["GET"])
 def get_emergency_status():
     """Comment: allow external clients to query the current emergency state"""
+    emergency_state = get_emergency_state()
     return {
-        "emergency_active": EMERGENCY_STATE["active"],
-        "timestamp": EMERGENCY_STATE["timestamp"],
-        "last_thread_id": EMERGENCY_STATE["last_thread_id"],
-        "message": EMERGENCY_STATE["message"]
+        "emergency_active": emergency_state["active"],
+        "timestamp": emergency_state["timestamp"],
+        "last_thread_id": emergency_state["last_thread_id"],
+        "message": emergency_state["message"]
     }
 
 
-@app.route("/emergency/reset", methods=["POST"])
+@routes.route("/emergency/reset", methods=["POST"])
 def reset_emergency_status():
     """Comment: allow external clients to reset the emergency state"""
-    global EMERGENCY_STATE
-    EMERGENCY_STATE = {
-        "active": False,
-        "timestamp": None,
-        "last_thread_id": None,
-        "message": None
-    }
+    set_emergency_state(EMPTY_EMERGENCY_STATE)
+    DASHBOARD.clear_emergencies()
     return {"status": "emergency_state_reset", "timestamp": get_current_time().isoformat(timespec="seconds")}
 
 
+# --------------------------
+# Processing queue (shared by webhook and polling ingestion)
+# --------------------------
+PROCESSING_QUEUE: "Queue[Dict[str, Any]]" = Queue(maxsize=PROCESSING_QUEUE_SIZE)
+_WORKERS: List[Thread] = []
+_WORKERS_LOCK = Lock()
+QUEUE_DEPTH.set_function(PROCESSING_QUEUE.qsize)
+
+
+def _processing_worker() -> None:
+    """Comment: drain the queue forever; process_webhook already swallows its own errors."""
+    while True:
+        payload = PROCESSING_QUEUE.get()
+        try:
+            process_webhook(payload)
+        finally:
+            PROCESSING_QUEUE.task_done()
+
+
+def start_processing_workers() -> None:
+    """Comment: start the fixed worker pool once, on first use."""
+    with _WORKERS_LOCK:
+        if _WORKERS:
+            return
+        for index in range(PROCESSING_WORKERS):
+            worker = Thread(target=_processing_worker, name=f"processor-{index}", daemon=True)
+            worker.start()
+            _WORKERS.append(worker)
+
+
+def enqueue_payload(payload: Dict[str, Any], block: bool = False) -> bool:
+    """Hand a webhook-shaped payload to the workers; False when the queue is full."""
+    start_processing_workers()
+    # Comment: fallback start point for the dashboard's reply latency
+    payload.setdefault("received_at", time.time())
+    try:
+        PROCESSING_QUEUE.put(payload, block=block)
+    except Full:
+        return False
+    return True
+
+
+def start_poller() -> MessagePoller:
+    """Comment: pull mail on a background thread, blocking on the queue for backpressure."""
+    # Comment: computed after fork so every worker process has its own identity
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    poller = MessagePoller(
+        get_client(),
+        INBOX,
+        lambda payload: admit_payload(payload, block=True),
+        min_interval=POLL_MIN_INTERVAL,
+        max_interval=POLL_MAX_INTERVAL,
+        batch_size=POLL_BATCH_SIZE,
+        is_leader=lambda: STATE.acquire_lease("poller", owner, POLL_LEASE_TTL),
+        load_cursor=load_poll_cursor,
+        save_cursor=save_poll_cursor,
+    )
+    poller.start()
+    return poller
+
+
+def load_poll_cursor() -> Optional[Tuple[datetime, List[str]]]:
+    saved = STATE.get(POLLER_NS, "cursor")
+    if not saved:
+        return None
+    return datetime.fromisoformat(saved["at"]), saved["seen"]
+
+
+def save_poll_cursor(cursor: datetime, seen_at_cursor: List[str]) -> None:
+    """Comment: persisted so a restart resumes from here instead of skipping mail that arrived meanwhile."""
+    STATE.set(POLLER_NS, "cursor", {"at": cursor.isoformat(), "seen": seen_at_cursor})
+
+
 # --------------------------
 # Webhook: receive emails
 # --------------------------
-@app.route("/webhooks", methods=["POST"])
+def admit_payload(payload: Dict[str, Any], block: bool = False) -> str:
+    """
+    Cheap admission checks run before any worker capacity is spent:
+    - Only fresh inbound messages ('received', not 'replied') are queued.
+    - Retries of an event or message we already accepted are dropped.
+    - When the queue is full the claims are released and "rejected" is returned.
+    """
+    email = payload.get("message") or {}
+    event_id = payload.get("event_id", "")
+    message_id = email.get("message_id", "")
+
+    # Gate: only reply to fresh inbound messages
+    if not should_reply_to(email):
+        outcome = "skipped"
+    else:
+        # Deduping: skip if we've seen this event or message
+        with span("dedup"):
+            already_processed = is_already_processed(event_id, message_id)
+        if already_processed:
+            outcome = "deduped"
+        elif enqueue_payload(payload, block=block):
+            return "accepted"
+        else:
+            release_processed(event_id, message_id)
+            outcome = "rejected"
+    MESSAGES_TOTAL.inc(outcome=outcome)
+    log_event(log, logging.DEBUG, f"payload_{outcome}", event_id=event_id, message_id=message_id)
+    return outcome
+
+
+@routes.route("/webhooks", methods=["POST"])
 def receive_webhook():
-    payload = request.json or {}
+    # Comment: refuse oversized bodies from the header alone, before reading them
+    if (request.content_length or 0) > MAX_WEBHOOK_BYTES:
+        return Response(status=413)
+    try:
+        payload = json_loads(request.get_data(cache=False))
+    except ValueError:
+        return Response(status=400)
+    # Comment: a 5xx would only invite retries of a payload that can never succeed
+    if not isinstance(payload, dict) or not isinstance(payload.get("message") or {}, dict):
+        return Response(status=400)
+
     # Respond immediately to avoid retries; process async to keep webhook snappy
-    Thread(target=process_webhook, args=(payload,)).start()
+    if admit_payload(payload) == "rejected":
+        # Comment: shed load and ask the sender to retry once the queue drains
+        return Response(status=503, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
     return Response(status=200)
 
 
 def process_webhook(payload: Dict[str, Any]) -> None:
+    """Handle a payload that already passed admit_payload (gating and dedup)."""
+    flight = start_flight(payload) if RECORDER is not None else None
+    token = CURRENT_FLIGHT.set(flight)
+    try:
+        with collect_stage_timings() if flight is not None else nullcontext() as stages:
+            with span("process_webhook"):
+                outcome = _process_webhook(payload)
+    finally:
+        CURRENT_FLIGHT.reset(token)
+    MESSAGES_TOTAL.inc(outcome=outcome)
+    if flight is not None:
+        finish_flight(flight, outcome, stages)
+
+
+def start_flight(payload: Dict[str, Any]) -> Dict[str, Any]:
+    email = payload.get("message") or {}
+    return {
+        "recorded_at": payload.get("received_at") or time.time(),
+        "event_id": payload.get("event_id", ""),
+        "message_id": email.get("message_id", ""),
+        "thread_id": email.get("thread_id", ""),
+        "payload": payload,
+        "input_items": [],
+        "tool_calls": [],
+        "final_output": None,
+        "started": time.perf_counter(),
+    }
+
+
+def finish_flight(flight: Dict[str, Any], outcome: str, stages: Dict[str, float]) -> None:
+    """Comment: write the recording; a failing recorder must never fail the message."""
+    flight["outcome"] = outcome
+    flight["stages"] = {stage: round(seconds, 6) for stage, seconds in stages.items()}
+    del flight["started"]
+    try:
+        RECORDER.record(flight)
+    except Exception as e:
+        log_event(log, logging.WARNING, "flight_record_failed", message_id=flight["message_id"], error=str(e))
+
+
+def _process_webhook(payload: Dict[str, Any]) -> str:
+    """Comment: handle one payload and return its outcome label for metrics."""
     try:
         event_id = payload.get("event_id", "")
         email = payload.get("message", {}) or {}
         message_id = email.get("message_id", "")
         thread_id = email.get("thread_id", "")
 
-        # Deduping: skip if we've seen this event or message
-        if is_already_processed(event_id, message_id):
-            print(f"[DEDUPED] event_id={event_id} message_id={message_id}")
-            return
-
-        # Gate: only reply to fresh inbound messages
-        if not should_reply_to(email):
-            print(f"[SKIP] Not an inbound/unreplied message (message_id={message_id})")
-            return
-
         # Build prompt and run the agent with per-thread memory
-        prompt = format_prompt_from_email(email)
-        print("\n=== Incoming Email =====================")
-        print(f"thread_id: {thread_id}")
-        print(f"message_id: {message_id}")
-        print(prompt)
-        print("=======================================\n")
+        with span("prompt_build"):
+            prompt = format_prompt_from_email(email)
+        log_event(
+            log, logging.INFO, "email_received", thread_id=thread_id, message_id=message_id, prompt=prompt
+        )
+
+        DASHBOARD.record_inbound(thread_id)
+        CURRENT_THREAD_ID.set(thread_id)
+        CURRENT_MESSAGE_ID.set(message_id)
 
         prior = get_thread_messages(thread_id)
-        response = asyncio.run(Runner.run(agent, prior + [{"role": "user", "content": prompt}]))
+        input_items = prior + [{"role": "user", "content": prompt}]
 
-        final_text = (response.final_output or "").strip()
+        # Comment: a bare pick of an offered slot is booked without a model round trip
+        fast_reply = try_scheduling_fast_path(thread_id, email)
+        if fast_reply is not None:
+            final_text = fast_reply
+            history = input_items + [{"role": "assistant", "content": fast_reply}]
+        else:
+            # Comment: the offer only stands if this turn's schedule_appointment call records it again;
+            # a turn that moves on without the tool must not leave a pick bookable
+            STATE.pop(SCHEDULING_STATE_NS, thread_id)
+            prefetch_availability(thread_id, email)
+            response = run_agent(input_items)
+            final_text = (response.final_output or "").strip()
+            history = response.to_input_list()
+        flight = CURRENT_FLIGHT.get()
+        if flight is not None:
+            flight["input_items"] = input_items
+            flight["final_output"] = final_text
 
         # When the agent returns JSON, treat it as a flagged response
         is_json = False
@@ -509,67 +1116,120 @@ def process_webhook(payload: Dict[str, Any]) -> None:
         if is_json and isinstance(parsed, dict) and parsed.get("emergency") is True:
             # Comment: store flagged responses with metadata for later review
             # Store flagged response for later human handling
-            FLAGGED_RESPONSES[thread_id] = {
+            STATE.set(FLAGGED_RESPONSES_NS, thread_id, {
                 "timestamp": get_current_time().isoformat(timespec="seconds"),
                 "message_id": message_id,
                 "event_id": event_id,
                 "payload": parsed,
-            }
+            })
 
-            # Comment: update global emergency state for external client monitoring
-            global EMERGENCY_STATE
-            EMERGENCY_STATE = {
+            # Comment: update shared emergency state for external client monitoring
+            emergency_state = {
                 "active": True,
                 "timestamp": get_current_time().isoformat(timespec="seconds"),
                 "last_thread_id": thread_id,
                 "message": parsed.get("message", "Emergency flagged by agent")
             }
+            set_emergency_state(emergency_state)
+            DASHBOARD.record_emergency(thread_id)
 
             # Comment: remind developers where to trigger notification hooks
-            print("\n=== Agent Flagged ======================")
-            print(json.dumps(FLAGGED_RESPONSES[thread_id], indent=2))
-            print(f"Emergency state activated: {EMERGENCY_STATE}")
-            print("=======================================\n")
+            log_event(
+                log,
+                logging.WARNING,
+                "agent_flagged",
+                thread_id=thread_id,
+                message_id=message_id,
+                event_id=event_id,
+                message=emergency_state["message"],
+            )
 
             # Comment: bail out early so no automated reply is sent
             # Optionally notify other systems here (e.g., emit WebSocket event)
-            return
+            return "flagged"
 
-        print("\n=== Agent Reply ========================")
-        print(final_text)
-        print("=======================================\n")
+        log_event(log, logging.INFO, "agent_reply", thread_id=thread_id, message_id=message_id, reply=final_text)
 
         # Send the reply (reply to THIS specific message_id)
-        client.inboxes.messages.reply(
-            inbox_id=INBOX,
-            message_id=message_id,
-            text=final_text,
-        )
-
-        # Update labels to prevent re-replying to the same message
-        try:
-            client.inboxes.messages.update(
+        with span("reply"):
+            get_client().inboxes.messages.reply(
                 inbox_id=INBOX,
                 message_id=message_id,
-                add_labels=["replied"],
-                remove_labels=["unreplied"],
+                text=final_text,
             )
+
+        # Update labels to prevent re-replying to the same message
+        try:
+            with span("label_update"):
+                get_client().inboxes.messages.update(
+                    inbox_id=INBOX,
+                    message_id=message_id,
+                    add_labels=["replied"],
+                    remove_labels=["unreplied"],
+                )
         except Exception as e:
             # Non-fatal; continue
-            print(f"[WARN] Failed to update labels for {message_id}: {e}")
+            log_event(log, logging.WARNING, "label_update_failed", message_id=message_id, error=str(e))
 
         # Persist per-thread memory
-        persist_thread_messages(thread_id, response)
+        persist_thread_messages(thread_id, history)
+        DASHBOARD.record_reply(thread_id, reply_latency_seconds(payload))
+        return "replied"
 
     except Exception as e:
-        print(f"[ERROR] process_webhook failed: {e}")
+        log_event(log, logging.ERROR, "process_webhook_failed", error=str(e), exc_info=True)
+        return "error"
+
+
+# --------------------------
+# App factory + warm-up
+# --------------------------
+def warm_up() -> None:
+    """Comment: initialize every dependency in the background, recording failures for /readyz."""
+    steps = [
+        ("agentmail", get_client),
+        ("agent", get_agent),
+        ("calendar", seed_available_slots),
+    ]
+    if USE_NGROK:
+        steps.insert(0, ("tunnel", get_listener))
+    for name, step in steps:
+        try:
+            with span(f"warm_up_{name}"):
+                step()
+        except Exception as e:
+            # Comment: not fatal — the lazy getters retry on first real use
+            mark_ready(name, error=str(e))
+            log_event(log, logging.ERROR, "warm_up_failed", dependency=name, error=str(e))
+
+    if INGESTION_MODE == "poll":
+        start_poller()
+        log_event(
+            log, logging.INFO, "polling_started", min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL
+        )
+    elif _listener is not None:
+        public_url = _listener.url() if hasattr(_listener, "url") else "(ngrok disabled)"
+        log_event(log, logging.INFO, "webhook_listening", public_url=public_url)
+
+
+def create_app(warm: bool = True) -> Flask:
+    """Build the Flask app; dependencies warm up on a background thread unless ``warm`` is False."""
+    app = Flask(__name__)
+    # Comment: also caps chunked bodies that arrive without a Content-Length header
+    app.config["MAX_CONTENT_LENGTH"] = MAX_WEBHOOK_BYTES
+    app.register_blueprint(routes)
+    METRICS.start()
+    for name in required_dependencies():
+        READINESS.setdefault(name, {"ready": False, "error": None})
+    if warm:
+        Thread(target=warm_up, name="warm-up", daemon=True).start()
+    return app
 
 
 # --------------------------
 # Entrypoint
 # --------------------------
 if __name__ == "__main__":
-    public_url = listener.url() if hasattr(listener, "url") else "(ngrok disabled)"
-    print(f"Public webhook URL: {public_url}")
-    print(f"Inbox: {INBOX}\n")
+    app = create_app()
+    log_event(log, logging.INFO, "server_starting", inbox=INBOX, port=PORT)
     app.run(port=PORT)
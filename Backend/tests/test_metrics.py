@@ -0,0 +1,45 @@
+import time
+
+from Metrics import Registry, SharedMetrics
+from StateStore import MemoryStateStore
+
+
+def worker_registry(messages: int, queued: int, seconds: float) -> Registry:
+    registry = Registry()
+    registry.counter("messages_total", "Messages.", ("outcome",)).inc(messages, outcome="replied")
+    registry.gauge("queue_depth", "Queue.").set(queued)
+    registry.histogram("stage_seconds", "Stages.", ("stage",), buckets=(0.1, 1.0)).observe(seconds, stage="run")
+    return registry
+
+
+def publish(store, registry, at):
+    store.set("metrics", f"worker-{id(registry)}", {"at": at, "metrics": registry.snapshot()})
+
+
+def test_render_matches_single_process_output():
+    registry = worker_registry(3, 2, 0.5)
+    assert registry.render_merged([(registry.snapshot(), True)]) == registry.render()
+
+
+def test_scrape_sums_every_worker():
+    store = MemoryStateStore()
+    first, second = worker_registry(3, 2, 0.05), worker_registry(4, 5, 0.5)
+    publish(store, second, time.time())
+    text = SharedMetrics(first, store).render()
+    assert 'messages_total{outcome="replied"} 7' in text
+    assert "queue_depth 7" in text
+    assert 'stage_seconds_bucket{stage="run",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="run",le="1"} 2' in text
+    assert 'stage_seconds_count{stage="run"} 2' in text
+    assert 'stage_seconds_sum{stage="run"} 0.55' in text
+
+
+def test_stopped_worker_keeps_totals_but_not_gauges():
+    store = MemoryStateStore()
+    first, stopped, expired = worker_registry(3, 2, 0.05), worker_registry(4, 5, 0.5), worker_registry(9, 9, 9)
+    publish(store, stopped, time.time() - 60)
+    publish(store, expired, time.time() - 2 * 24 * 3600)
+    text = SharedMetrics(first, store, interval=5).render()
+    assert 'messages_total{outcome="replied"} 7' in text
+    assert "queue_depth 2" in text
+    assert len(store.keys("metrics")) == 2
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+
+from SlotChoice import MAX_CHOICE_CHARS, match_offered_slot, render_confirmation
+from SlotKeys import CLINIC_TIMEZONE, to_key
+
+
+def slot(day: int, hour: int, minute: int = 0) -> int:
+    return to_key(datetime(2025, 9, day, hour, minute, tzinfo=CLINIC_TIMEZONE))
+
+
+# Comment: Monday 29th and Tuesday 30th September 2025
+MON_10 = slot(29, 10)
+MON_14 = slot(29, 14)
+TUE_10 = slot(30, 10)
+TUE_1430 = slot(30, 14, 30)
+OFFERED = [MON_10, MON_14, TUE_10, TUE_1430]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2pm works", MON_14),
+    ("2 p.m. please", MON_14),
+    ("Tuesday at 10am please", TUE_10),
+    ("tue 10:00", TUE_10),
+    ("2:30 works, thanks!", TUE_1430),
+    ("Sept 30 at 2:30pm", TUE_1430),
+    ("9/29 10am", MON_10),
+    ("Monday 2pm, great", MON_14),
+    ("ok, 2pm is perfect", MON_14),
+])
+def test_unambiguous_pick(text, expected):
+    assert match_offered_slot(text, OFFERED) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "10am",  # Monday and Tuesday
+    "Tuesday",  # two Tuesday slots
+    "Wednesday at 10am",  # not offered
+    "2pm or 10am",
+    "can we do 2pm?",
+    "not 2pm, I'm busy",
+    "2pm works but I need to bring my son",
+    "yes",  # several slots offered
+    "",
+])
+def test_no_clear_pick(text):
+    assert match_offered_slot(text, OFFERED) is None
+
+
+@pytest.mark.parametrize("text", ["yes", "Yes, please book it", "confirm", "that works, thanks"])
+def test_confirmation_with_single_offer(text):
+    assert match_offered_slot(text, [MON_14]) == MON_14
+
+
+@pytest.mark.parametrize("text", ["ok thank you", "Great, thanks!", "perfect", "sounds good", "fine", "okay"])
+def test_acknowledgement_is_not_confirmation(text):
+    assert match_offered_slot(text, [MON_14]) is None
+
+
+def test_patient_name_is_allowed():
+    assert match_offered_slot("2pm works, Jane Doe", OFFERED) is None
+    assert match_offered_slot("2pm works, Jane Doe", OFFERED, extra_words=["Jane", "Doe"]) == MON_14
+
+
+def test_long_reply_goes_to_agent():
+    assert match_offered_slot("2pm " + "please " * MAX_CHOICE_CHARS, OFFERED) is None
+
+
+def test_nothing_offered():
+    assert match_offered_slot("2pm works", []) is None
+
+
+def test_render_confirmation():
+    body = render_confirmation(
+        {"patient": "Jane Doe", "provider": "Dr. Smith", "location": "Main St", "confirmation_id": "CONF-0007"},
+        MON_14,
+    )
+    assert body.startswith("Hi Jane,")
+    assert "Monday, September 29, 2025 at 02:00 PM" in body
+    assert "Confirmation ID: CONF-0007" in body
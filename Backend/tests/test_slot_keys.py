@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+
+from SlotKeys import CLINIC_TIMEZONE, SlotParseError, from_key, key_to_iso, parse_slot, to_key
+
+TEN_AM = to_key(datetime(2025, 9, 29, 10, 0, tzinfo=CLINIC_TIMEZONE))
+
+
+@pytest.mark.parametrize("raw", [
+    "2025-09-29T10:00",
+    "2025-09-29T10:00:00-04:00",
+    "2025-09-29T14:00:00Z",
+    "2025-09-29 10:00 AM",
+    "2025-09-29 10 am",
+    "2025-09-29 10:00 a.m.",
+    "09/29/2025 10:00 AM",
+    "09/29/2025 10:00",
+    "September 29, 2025 at 10:00 AM",
+    "Sep 29, 2025 10:00 AM",
+    "Monday, September 29, 2025 at 10:00 AM",
+    "2025-09-29T10:00 (UTC-4)",
+    "2025-09-29 10:00 AM EDT",
+    "  2025-09-29   10:00 AM  ",
+])
+def test_parse_slot_formats(raw):
+    assert parse_slot(raw) == TEN_AM
+
+
+def test_parse_slot_date_only_means_opening_hour():
+    assert from_key(parse_slot("2025-09-29")).hour == 9
+
+
+def test_parse_slot_keeps_minutes_and_drops_seconds():
+    assert key_to_iso(parse_slot("2025-09-29T10:30:45")) == "2025-09-29T10:30-04:00"
+
+
+@pytest.mark.parametrize("raw, reason", [
+    ("", "empty slot"),
+    ("   ", "empty slot"),
+    ("next tuesday-ish", "unrecognized date/time format"),
+    ("2025-13-40T10:00", "unrecognized date/time format"),
+])
+def test_parse_slot_errors(raw, reason):
+    with pytest.raises(SlotParseError) as excinfo:
+        parse_slot(raw)
+    assert excinfo.value.to_dict() == {"input": raw, "error": reason}
+
+
+def test_key_round_trip():
+    moment = datetime(2025, 9, 29, 16, 30, tzinfo=CLINIC_TIMEZONE)
+    assert from_key(to_key(moment)) == moment
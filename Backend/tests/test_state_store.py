@@ -0,0 +1,130 @@
+import multiprocessing
+import time
+
+import pytest
+
+from StateStore import MemoryStateStore, SQLiteStateStore, StateStore, create_store
+
+# Comment: the cross-process tests rely on fork so the workers need no importable test module
+FORK = multiprocessing.get_context("fork")
+WORKERS = 6
+KEYS = 300
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path) -> StateStore:
+    if request.param == "memory":
+        return MemoryStateStore()
+    return SQLiteStateStore(str(tmp_path / "state.db"))
+
+
+def test_get_set_pop_contains(store):
+    assert store.get("ns", "a", "missing") == "missing"
+    store.set("ns", "a", {"n": 1})
+    assert store.get("ns", "a") == {"n": 1}
+    assert store.contains("ns", "a")
+    assert not store.contains("other", "a")
+    assert store.pop("ns", "a") == {"n": 1}
+    assert store.pop("ns", "a", "gone") == "gone"
+    assert not store.contains("ns", "a")
+
+
+def test_claim_is_first_writer_wins(store):
+    assert store.claim("ns", "a", 1)
+    assert not store.claim("ns", "a", 2)
+    assert store.get("ns", "a") == 1
+
+
+def test_claim_evicts_oldest_past_max_items(store):
+    for index in range(250):
+        store.claim("ns", str(index), True, max_items=50)
+    keys = store.keys("ns")
+    # Comment: SQLite trims in batches, so it may briefly hold up to TRIM_EVERY extra claims
+    assert 50 <= len(keys) <= 50 + SQLiteStateStore.TRIM_EVERY
+    assert keys == sorted(keys, key=int)
+    assert keys[-1] == "249"
+
+
+def test_claim_trims_each_namespace(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / "state.db"))
+    for index in range(2000):
+        store.claim("busy", str(index), True, max_items=500)
+        if index % 4 == 0:
+            store.claim("quiet", str(index), True, max_items=100)
+    assert len(store.keys("busy")) <= 500 + SQLiteStateStore.TRIM_EVERY
+    assert len(store.keys("quiet")) <= 100 + SQLiteStateStore.TRIM_EVERY
+
+
+def test_replace_swaps_whole_namespace(store):
+    store.set("ns", "old", 1)
+    store.set("keep", "x", 1)
+    store.replace("ns", {"a": 1, "b": 2})
+    assert store.items("ns") == {"a": 1, "b": 2}
+    assert store.items("keep") == {"x": 1}
+    store.replace("ns", {})
+    assert store.items("ns") == {}
+
+
+def test_incr(store):
+    assert store.incr("ns", "n") == 1
+    assert store.incr("ns", "n", 5) == 6
+    assert store.incr("ns", "n", -2) == 4
+    assert store.get("ns", "n") == 4
+
+
+def test_lease_is_exclusive_until_it_expires(store):
+    assert store.acquire_lease("poller", "a", ttl=0.2)
+    assert not store.acquire_lease("poller", "b", ttl=0.2)
+    assert store.acquire_lease("poller", "a", ttl=0.2)
+    time.sleep(0.3)
+    assert store.acquire_lease("poller", "b", ttl=0.2)
+    assert not store.acquire_lease("poller", "a", ttl=0.2)
+
+
+def test_create_store(tmp_path):
+    assert isinstance(create_store("memory"), MemoryStateStore)
+    assert isinstance(create_store("sqlite", str(tmp_path / "state.db")), SQLiteStateStore)
+    with pytest.raises(ValueError):
+        create_store("redis")
+
+
+# ---- across processes ---------------------------------------------------------
+
+
+def _claim_all(path, results):
+    store = SQLiteStateStore(path)
+    results.put([key for key in range(KEYS) if store.claim("claims", str(key), True)])
+
+
+def _incr_many(path):
+    store = SQLiteStateStore(path)
+    for _ in range(100):
+        store.incr("counters", "n")
+
+
+def _run(target, *args):
+    processes = [FORK.Process(target=target, args=args) for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def test_claims_are_unique_across_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    SQLiteStateStore(path)
+    results = FORK.Queue()
+    processes = _run(_claim_all, path, results)
+    won = [key for _ in processes for key in results.get(timeout=60)]
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+    assert sorted(won) == list(range(KEYS))
+
+
+def test_incr_is_atomic_across_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SQLiteStateStore(path)
+    for process in _run(_incr_many, path):
+        process.join(timeout=60)
+        assert process.exitcode == 0
+    assert store.get("counters", "n") == WORKERS * 100